@@ -1,36 +1,109 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple
 from collections import defaultdict
+from dataclasses import dataclass
+from bisect import bisect_left
 import logging
 import math
+import sys
+import threading
+import time
+import numpy as np
 from config import AppConfig
 from shipping_fetcher import GoogleSheetsShippingSource
-from price_fetcher import PriceFetcher
+from price_fetcher import get_price_fetcher
 from ioss_fetcher import IossFetcher
-from models import Product, ShippingRule, CalculationResult, IossRule, Order, Invoice
+from shipping_kernels import compute_fee, compute_weights
+from models import Product, ProductBatch, ShippingRule, ShippingRuleInfo, CalculationResult, IossRule, Order, Invoice
 
 logger = logging.getLogger(__name__)
 
+# 货物属性优先级: 食品 > 纯电 > 特货 > 带电 > 普货（数值越小优先级越高）
+_ATTR_RANK = {'食品': 0, '纯电': 1, '特货': 2, '带电': 3, '普货': 4}
+_DEFAULT_ATTRIBUTE = '普货'
+
+@dataclass(frozen=True, slots=True)
+class _KeyedRule:
+    """带原始序号和展示用取整费用的运费规则记录"""
+    position: int  # 规则在表格中的原始序号
+    rule: ShippingRule
+    first_weight_fee_r: float  # 首重费用(保留3位小数，用于前端展示)
+    additional_weight_price_r: float  # 续重单价(保留3位小数，用于前端展示)
+
+def _build_keyed_rules(rules: List[ShippingRule]) -> Tuple[_KeyedRule, ...]:
+    """将运费规则转换为只读记录"""
+    return tuple(
+        _KeyedRule(position, rule, round(rule.first_weight_fee, 3), round(rule.additional_weight_price, 3))
+        for position, rule in enumerate(rules)
+    )
+
+def _build_rules_index(keyed_rules: Tuple[_KeyedRule, ...]) -> Dict[Tuple[str, str], Tuple[tuple, tuple]]:
+    """按(国家, 货物属性)对运费规则分桶，桶内按重量下限排序
+
+    Returns:
+        {(国家小写, 属性小写): (重量下限元组, 规则记录元组)}
+    """
+    buckets = defaultdict(list)
+    for keyed_rule in keyed_rules:
+        buckets[(keyed_rule.rule.country_key, keyed_rule.rule.attribute_key)].append(keyed_rule)
+
+    index = {}
+    for key, records in buckets.items():
+        records.sort(key=lambda record: record.rule.weight_min)
+        index[key] = (tuple(record.rule.weight_min for record in records), tuple(records))
+    return index
+
+# 运费规则缓存有效期由config.sheets_cache_ttl_seconds决定，过期后重新从数据源加载，以便表格更新能够生效
+_rules_lock = threading.Lock()
+# {(文档ID, 工作表名): (加载时间, 规则记录元组, 规则索引)}
+_rules_cache: Dict[Tuple[str, str], Tuple[float, Tuple[_KeyedRule, ...], dict]] = {}
+
+def _get_shipping_rules(config: AppConfig) -> Tuple[Tuple[_KeyedRule, ...], dict]:
+    """获取运费规则记录及其索引(进程内共享，按有效期刷新，线程安全)"""
+    key = (config.google_sheets['document_id'], config.google_sheets_shipping_sheet_name)
+    ttl_seconds = config.sheets_cache_ttl_seconds
+    cached = _rules_cache.get(key)
+    if cached is not None and time.monotonic() - cached[0] < ttl_seconds:
+        return cached[1], cached[2]
+
+    with _rules_lock:
+        # 获取锁后再次检查，避免多个线程同时重复加载
+        cached = _rules_cache.get(key)
+        if cached is not None and time.monotonic() - cached[0] < ttl_seconds:
+            return cached[1], cached[2]
+        try:
+            keyed_rules = _build_keyed_rules(GoogleSheetsShippingSource(config).load_rules())
+        except Exception:
+            if cached is None:
+                raise
+            # 刷新失败时继续使用旧规则，待下一个有效期后再重试
+            logger.warning("刷新运费规则失败，继续使用已缓存的运费规则", exc_info=True)
+            keyed_rules = cached[1]
+            rules_index = cached[2]
+        else:
+            rules_index = _build_rules_index(keyed_rules)
+        _rules_cache[key] = (time.monotonic(), keyed_rules, rules_index)
+        return keyed_rules, rules_index
+
 class Calculator:
     """价格计算器，包含产品价格、运费和IOSS税金计算逻辑"""
-    # 使用类变量缓存shipping_rules
-    _shipping_rules_cache = None
-    _data_source_cache = None
-
     def __init__(self, config: AppConfig):
         self.config = config
+        # 首次创建时预先加载运费规则
+        _get_shipping_rules(config)
         
-        # 初始化或复用data_source
-        if Calculator._data_source_cache is None:
-            Calculator._data_source_cache = GoogleSheetsShippingSource(config)
-        self.data_source = Calculator._data_source_cache
-        
-        # 加载或复用shipping_rules
-        if Calculator._shipping_rules_cache is None:
-            Calculator._shipping_rules_cache = self.data_source.load_rules()
-        self.shipping_rules = Calculator._shipping_rules_cache
-        
+        # IOSS税率规则按有效期刷新(查询结果缓存在IossFetcher中，刷新时清空)
         self.ioss_fetcher = IossFetcher(config)
-        self.price_fetcher = PriceFetcher(config)
+        self.price_fetcher = get_price_fetcher(config)
+
+    @property
+    def shipping_rules(self) -> Tuple[_KeyedRule, ...]:
+        """当前有效的运费规则记录"""
+        return _get_shipping_rules(self.config)[0]
+
+    @property
+    def rules_index(self) -> dict:
+        """当前有效的按(国家, 属性)分桶的运费规则索引"""
+        return _get_shipping_rules(self.config)[1]
 
     def find_applicable_shipping_rules(self, products: List[Product], destination: str, volume_weight_ratio: int) -> List[Dict[str, Any]]:
         """查找所有适用的运费规则,给前端展示
@@ -42,59 +115,37 @@ class Calculator:
         Returns:
             适用运费规则列表
         """
-        # 计算产品总重量和收集产品属性
-        total_weight = 0
-        product_attributes = set()
-        for product in products:
-            # 计算实际重量
-            actual_weight = product.quantity * product.weight
-            # 存储实际重量到产品对象
+        # 计算产品总重量（实际重量与体积重量取较大值，向量化计算）
+        batch = ProductBatch.from_products(products)
+        actual_weights, volume_weights = compute_weights(batch.quantity, batch.weight, batch.length, batch.width,
+                                                         batch.height, volume_weight_ratio)
+        # 使用math.fsum精确求和，避免浮点累积误差使总重量越过规则的重量上下限
+        total_weight = math.fsum(np.maximum(actual_weights, volume_weights).tolist())
+
+        # 存储实际重量和体积重量到产品对象
+        for product, actual_weight, volume_weight in zip(products, actual_weights.tolist(), volume_weights.tolist()):
             product.actual_weight = actual_weight
-            
-            # 计算体积重量（如果长、宽、高都有值）
-            if product.length and product.width and product.height:
-                volume_weight = product.length * product.width * product.height / volume_weight_ratio
-                # 体积重量乘以数量
-                volume_weight *= product.quantity
-                # 存储体积重量到产品对象
-                product.volume_weight = volume_weight
-                # 取实际重量和体积重量中的较大值
-                product_total_weight = max(actual_weight, volume_weight)
-            else:
-                product.volume_weight = 0
-                product_total_weight = actual_weight
-            
-            total_weight += product_total_weight
-            product_attributes.add(product.attribute)
-        logger.info(f"累积物品重量: {total_weight}g")
-
-        # 定义属性优先级: 食品 > 纯电 > 特货 > 带电 > 普货
-        attribute_priority = ['食品', '纯电', '特货', '带电', '普货']
+            product.volume_weight = volume_weight
+        logger.info("累积物品重量: %sg", total_weight)
 
         # 根据优先级确定最高优先级的属性
-        for attr in attribute_priority:
-            if attr in product_attributes:
-                attribute = attr
-                break
-        else:
-            attribute = '普货'  # 默认值
-
-        logger.info(f"确定最高优先级属性: {attribute}")
-
-        # 查找适用的运费规则
-        applicable_rules = [
-            rule for rule in self.shipping_rules
-            if rule.country.lower() == destination.lower()
-            and rule.attribute.lower() == attribute.lower()
-            and rule.weight_min < total_weight <= rule.weight_max
-        ]
-
-        if not applicable_rules:
-            logger.warning(f"未找到适用的运费规则: 国家={destination}, 属性={attribute}, 重量={total_weight}")
-            return []
-
-        # 转换为字典列表直接返回，并包含total_weight
-        return [{
+        product_attributes = {product.attribute for product in products}
+        attribute = min((attr for attr in product_attributes if attr in _ATTR_RANK),
+                        key=_ATTR_RANK.__getitem__, default=_DEFAULT_ATTRIBUTE)
+
+        logger.info("确定最高优先级属性: %s", attribute)
+
+        # 查找适用的运费规则：先按(国家, 属性)定位分桶，再二分找出重量下限小于总重量的规则
+        dest_lc = sys.intern(destination.lower())
+        attr_lc = sys.intern(attribute.lower())
+        weight_mins, records = self.rules_index.get((dest_lc, attr_lc), ((), ()))
+        candidates = records[:bisect_left(weight_mins, total_weight)]
+        # 保持规则在表格中的原始顺序，过滤与转换为字典在同一遍中完成
+        applicable_records = (
+            record for record in sorted(candidates, key=lambda record: record.position)
+            if total_weight <= record.rule.weight_max
+        )
+        result = [{
             'id': i,
             'shipping_company': rule.shipping_company,
             'country': rule.country,
@@ -103,16 +154,20 @@ class Calculator:
             'weight_min': rule.weight_min,
             'weight_max': rule.weight_max,
             'first_weight': rule.first_weight,
-            'first_weight_fee': round(rule.first_weight_fee, 3),
+            'first_weight_fee': record.first_weight_fee_r,
             'additional_weight': rule.additional_weight,
-            'additional_weight_price': round(rule.additional_weight_price, 3),
+            'additional_weight_price': record.additional_weight_price_r,
             'min_delivery_days': rule.min_delivery_days,
             'max_delivery_days': rule.max_delivery_days,
             'registration_fee': rule.registration_fee,
             'total_weight': total_weight  # 添加total_weight到返回数据中
-        } for i, rule in enumerate(applicable_rules)]
+        } for i, record in enumerate(applicable_records) for rule in (record.rule,)]
+
+        if not result:
+            logger.warning("未找到适用的运费规则: 国家=%s, 属性=%s, 重量=%s", destination, attribute, total_weight)
+        return result
 
-    def calculate_shipping_fee(self, products: List[Product], selected_shipping_rules: dict) -> tuple[float, dict]:
+    def calculate_shipping_fee(self, products: List[Product], selected_shipping_rules: dict) -> tuple[float, ShippingRuleInfo]:
         """计算产品的运费
 
         Args:
@@ -122,86 +177,103 @@ class Calculator:
         Returns:
             运费金额和使用的规则信息
         """
+        return self._calculate_shipping_fee(ProductBatch.from_products(products), selected_shipping_rules)
+
+    def _calculate_shipping_fee(self, batch: ProductBatch, selected_shipping_rules: dict) -> tuple[float, ShippingRuleInfo]:
+        """按已构建的产品批量数据计算运费"""
         # 尝试从selected_shipping_rules中获取total_weight
         total_weight = selected_shipping_rules.get('total_weight')
         
-        # 如果没有提供total_weight，则计算
+        # 如果没有提供total_weight，则按数量*重量向量化计算
         if total_weight is None:
-            total_weight = sum(product.quantity * product.weight for product in products)
-            logger.info(f"计算累积物品重量: {total_weight}g")
+            total_weight = math.fsum((batch.quantity * batch.weight).tolist())
+            logger.info("计算累积物品重量: %sg", total_weight)
         else:
-            logger.info(f"使用已计算的累积物品重量: {total_weight}g")
-
-        # 记录命中的规则信息
-        logger.info(f"使用运费规则: 国家={selected_shipping_rules['country']}, 属性={selected_shipping_rules['attribute']}, 区域={selected_shipping_rules['region']}, 重量范围={selected_shipping_rules['weight_min']}-{selected_shipping_rules['weight_max']}g, 首重={selected_shipping_rules['first_weight']}g, 首重费用={selected_shipping_rules['first_weight_fee']}元, 续重={selected_shipping_rules['additional_weight']}g, 续重单价={selected_shipping_rules['additional_weight_price']}元, 挂号费={selected_shipping_rules['registration_fee']}元/票")
-
-        # 计算运费
+            logger.info("使用已计算的累积物品重量: %sg", total_weight)
+
+        # 一次性读取规则字段
+        country = selected_shipping_rules['country']
+        attribute = selected_shipping_rules['attribute']
+        region = selected_shipping_rules['region']
+        weight_min = selected_shipping_rules['weight_min']
+        weight_max = selected_shipping_rules['weight_max']
         first_weight = selected_shipping_rules['first_weight']
         first_weight_fee = selected_shipping_rules['first_weight_fee']
         additional_weight = selected_shipping_rules['additional_weight']
         additional_weight_price = selected_shipping_rules['additional_weight_price']
         registration_fee = selected_shipping_rules['registration_fee']
+        min_days = selected_shipping_rules['min_delivery_days']
+        max_days = selected_shipping_rules['max_delivery_days']
 
-        if total_weight <= first_weight:
-            # 未超过首重
-            shipping_fee = first_weight_fee + registration_fee
-        else:
-            # 超过首重，计算续重费用
-            remaining_weight = total_weight - first_weight
-            # 计算需要多少个续重单位
-            additional_units = remaining_weight / additional_weight
-            # 向上取整
-            additional_units = math.ceil(additional_units)
-            shipping_fee = first_weight_fee + (additional_units * additional_weight_price) + registration_fee
+        # 记录命中的规则信息
+        logger.info("使用运费规则: 国家=%s, 属性=%s, 区域=%s, 重量范围=%s-%sg, 首重=%sg, 首重费用=%s元, 续重=%sg, 续重单价=%s元, 挂号费=%s元/票",
+                    country, attribute, region, weight_min, weight_max, first_weight, first_weight_fee,
+                    additional_weight, additional_weight_price, registration_fee)
+
+        # 计算运费
+        shipping_fee = compute_fee(total_weight, first_weight, first_weight_fee,
+                                   additional_weight, additional_weight_price, registration_fee)
 
-        logger.info(f"计算运费成功: 总重量={total_weight}g, 运费={shipping_fee}")
+        logger.info("计算运费成功: 总重量=%sg, 运费=%s", total_weight, shipping_fee)
 
         # 计算时效信息
-        min_days = selected_shipping_rules['min_delivery_days']
-        max_days = selected_shipping_rules['max_delivery_days']
         estimated_delivery_time = f"{min_days}-{max_days}天" if min_days > 0 and max_days > 0 else ""
 
         # 返回运费和规则信息
-        rule_info = {
-            'shipping_company': selected_shipping_rules.get('shipping_company', ''),
-            'region': selected_shipping_rules.get('region', ''),
-            'estimated_delivery_time': estimated_delivery_time,
-            'min_delivery_days': min_days,
-            'max_delivery_days': max_days,
-            'first_weight': first_weight,
-            'first_weight_fee': first_weight_fee,
-            'additional_weight': additional_weight,
-            'additional_weight_price': additional_weight_price,
-            'registration_fee': registration_fee,
-            'actual_weight': total_weight
-        }
+        rule_info = ShippingRuleInfo(
+            shipping_company=selected_shipping_rules.get('shipping_company', ''),
+            region=region,
+            estimated_delivery_time=estimated_delivery_time,
+            min_delivery_days=min_days,
+            max_delivery_days=max_days,
+            first_weight=first_weight,
+            first_weight_fee=first_weight_fee,
+            additional_weight=additional_weight,
+            additional_weight_price=additional_weight_price,
+            registration_fee=registration_fee,
+            actual_weight=total_weight
+        )
 
         return shipping_fee, rule_info
 
     def calculate_total_ioss_tax(self, products: List[Product], destination: str) -> tuple[float, Dict[str, Any]]:
         """计算所有产品的总IOSS税金并返回相关信息"""
-        logger.info(f"开始计算所有产品的IOSS税金，目的地: {destination}")
+        _, total_ioss_tax, ioss_info = self._calculate_ioss_taxes(ProductBatch.from_products(products), destination)
+        return total_ioss_tax, ioss_info
 
-        # 计算总IOSS价格
-        total_ioss_price = sum(product.ioss_price * product.quantity for product in products if product.ioss_price > 0)
-        logger.info(f"总IOSS价格: {total_ioss_price}")
+    def _calculate_ioss_taxes(self, batch: ProductBatch, destination: str) -> tuple[np.ndarray, float, Dict[str, Any]]:
+        """一次性计算每个产品的IOSS税金(同一目的地只查询一次税率规则)
 
+        Returns:
+            每个产品的IOSS税金数组、总IOSS税金和规则信息
+        """
+        logger.info("开始计算所有产品的IOSS税金，目的地: %s", destination)
+
+        # 计算每个产品的IOSS价格（IOSS价格*数量，未设置IOSS价格的产品为0）
+        ioss_values = np.where(batch.ioss_price > 0, batch.ioss_price * batch.quantity, 0.0)
+        total_ioss_price = float(ioss_values.sum())
+
+        # 没有任何产品设置有效IOSS价格时直接返回，避免查询税率
         if total_ioss_price <= 0:
             logger.warning("所有产品的IOSS价格均无效，无法计算IOSS税金")
-            return 0.0, {}
+            return np.zeros(len(batch)), 0.0, {}
 
         # 获取IOSS税率规则
         ioss_rule = self.ioss_fetcher.get_ioss_rule(destination)
         if not ioss_rule:
-            logger.warning(f"未找到目的地'{destination}'的IOSS税率规则，无法计算IOSS税金")
-            return 0.0, {}
+            logger.warning("未找到目的地'%s'的IOSS税率规则，无法计算IOSS税金", destination)
+            return np.zeros(len(batch)), 0.0, {}
+        logger.info("总IOSS价格: %s", total_ioss_price)
 
         # 计算VAT税费和服务费（注意：税率已在ioss_fetcher中转换为小数）
         vat_tax = total_ioss_price * ioss_rule.vat_rate
         service_fee = total_ioss_price * ioss_rule.service_rate
         total_ioss_tax = vat_tax + service_fee
+        product_ioss_taxes = ioss_values * (ioss_rule.vat_rate + ioss_rule.service_rate)
 
-        logger.info(f"计算IOSS税金成功: 总IOSS价格={total_ioss_price}, VAT税率={ioss_rule.vat_rate*100}%, 服务费率={ioss_rule.service_rate*100}%, VAT税费={vat_tax:.2f}, 服务费={service_fee:.2f}, 总IOSS税金={total_ioss_tax:.2f}")
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("计算IOSS税金成功: 总IOSS价格=%s, VAT税率=%s%%, 服务费率=%s%%, VAT税费=%.2f, 服务费=%.2f, 总IOSS税金=%.2f",
+                        total_ioss_price, ioss_rule.vat_rate * 100, ioss_rule.service_rate * 100, vat_tax, service_fee, total_ioss_tax)
 
         # 返回总IOSS税金和规则信息
         ioss_info = {
@@ -213,12 +285,12 @@ class Calculator:
             'total_ioss_price': total_ioss_price
         }
 
-        return total_ioss_tax, ioss_info
+        return product_ioss_taxes, total_ioss_tax, ioss_info
 
-    def calculate_totals(self, products: List[Product], destination: str, selected_shipping_rules: dict = None) -> tuple[CalculationResult, dict, dict]:
+    def calculate_totals(self, products: List[Product], destination: str, selected_shipping_rules: dict = None) -> tuple[CalculationResult, ShippingRuleInfo, dict]:
         """计算产品总价、运费和IOSS税金的累计值"""
         if not products:
-            return CalculationResult(products=[], total_amount=0.0, ioss_taxes=0.0), {}, {}
+            return CalculationResult(products=[], total_amount=0.0, ioss_taxes=0.0), ShippingRuleInfo(), {}
 
         # 检查selected_shipping_rules是否为空
         if not selected_shipping_rules:
@@ -229,48 +301,52 @@ class Calculator:
         required_fields = ['shipping_company']
         for field in required_fields:
             if field not in selected_shipping_rules:
-                logger.error(f"运费规则缺少必要字段: {field}")
+                logger.error("运费规则缺少必要字段: %s", field)
                 raise ValueError(f"运费规则缺少必要字段: {field}")
 
+        # 一次性构建产品批量数组，运费、产品总价和IOSS税金都基于同一批数组计算
+        n = len(products)
+        batch = ProductBatch.from_products(products)
+
         # 计算总运费
-        total_shipping_fee, rule_info = self.calculate_shipping_fee(products, selected_shipping_rules)
+        total_shipping_fee, rule_info = self._calculate_shipping_fee(batch, selected_shipping_rules)
 
-        # 计算产品基础总价
-        total_product_price = 0.0
-        for product in products:
-            if product.total <= 0 and product.price > 0:
-                logger.info(f"开始计算，产品 {product.sku} 总价格")
-                product.total = product.price * product.quantity
-            total_product_price += product.total
+        # 计算产品基础总价（向量化计算）
+        # 每次都按单价*数量重新计算，避免重复调用时在product.total上累加
+        base_totals = np.where(batch.price > 0, batch.price * batch.quantity, 0.0)
+        total_product_price = float(base_totals.sum())
 
-        # 计算总IOSS税金
-        total_ioss_tax, ioss_info = self.calculate_total_ioss_tax(products, destination)
+        # 计算总IOSS税金及每个产品按自身IOSS价格计算的税金（而非平均分摊）
+        product_ioss_taxes, total_ioss_tax, ioss_info = self._calculate_ioss_taxes(batch, destination)
 
         # 计算总金额（产品基础总价 + 总IOSS税金 + 总运费）
         total_amount = total_product_price + total_ioss_tax + total_shipping_fee
 
-        # 保存总运费和总IOSS税金到每个产品
-        for product in products:
-            product.shipping_fee = total_shipping_fee / len(products)  # 平均分摊运费
-            product.ioss_tax = total_ioss_tax / len(products)  # 平均分摊IOSS税金
-            product.total = product.total + product.shipping_fee + product.ioss_tax
+        # 保存运费(平均分摊)和IOSS税金到每个产品
+        sf_share = total_shipping_fee / n
+        product_totals = base_totals + sf_share + product_ioss_taxes
+        for product, product_total, product_ioss_tax in zip(products, product_totals.tolist(), product_ioss_taxes.tolist()):
+            product.shipping_fee = sf_share
+            product.ioss_tax = product_ioss_tax
+            product.total = product_total
 
-        logger.info(f"总产品基础价格: {total_product_price}, 总IOSS税金: {total_ioss_tax}, 总运费: {total_shipping_fee}, 总金额: {total_amount}")
+        logger.info("总产品基础价格: %s, 总IOSS税金: %s, 总运费: %s, 总金额: %s", total_product_price, total_ioss_tax, total_shipping_fee, total_amount)
 
         return CalculationResult(products=products, total_amount=total_amount, ioss_taxes=total_ioss_tax), rule_info, ioss_info
 
-    def _group_orders_by_number(self, orders: List[Order]) -> Dict[str, List[Order]]:
-        """按交易编号分组订单的辅助方法"""
+    def group_orders_by_number(self, orders: List[Order]) -> Dict[str, List[Order]]:
+        """按交易编号分组订单，分组结果可在订单总计和发票创建之间共享"""
         grouped = defaultdict(list)
         for order in orders:
             grouped[order.order_number].append(order)
         return grouped
 
-    def calculate_order_totals(self, orders: List[Order]) -> tuple[Dict[str, float], Dict[str, float]]:
+    def calculate_order_totals(self, orders: List[Order], grouped_orders: Dict[str, List[Order]] = None) -> tuple[Dict[str, float], Dict[str, float]]:
         """同时计算每个订单的产品总价和IOSS费用
 
         Args:
             orders: 订单对象列表
+            grouped_orders: 已按交易编号分组的订单，未提供时在内部分组
 
         Returns:
             tuple: 包含产品总价字典和IOSS费用字典的元组
@@ -284,88 +360,99 @@ class Calculator:
         # 验证所有订单国家是否一致
         for order in orders:
             if order.country.lower() != base_country.lower():
-                logger.warning(f"订单国家不一致: 基准国家={base_country}, 订单{order.order_number}国家={order.country}")
+                logger.warning("订单国家不一致: 基准国家=%s, 订单%s国家=%s", base_country, order.order_number, order.country)
 
         # 只获取一次IOSS规则
         ioss_rule = self.ioss_fetcher.get_ioss_rule(base_country)
         if not ioss_rule:
-            logger.warning(f"未找到国家'{base_country}'的IOSS税率规则，所有订单IOSS费用将为0")
-            ioss_available = False
+            logger.warning("未找到国家'%s'的IOSS税率规则，所有订单IOSS费用将为0", base_country)
+            ioss_factor = 0.0
         else:
-            ioss_available = True
+            # IOSS综合费率 = VAT税率 + 服务费率
+            ioss_factor = ioss_rule.vat_rate + ioss_rule.service_rate
 
         # 获取产品数据(利用缓存机制)
         product_data = self.price_fetcher.data_source.load_product_data()
 
         # 按交易编号分组订单
-        grouped_orders = self._group_orders_by_number(orders)
+        if grouped_orders is None:
+            grouped_orders = self.group_orders_by_number(orders)
 
         order_product_totals = {}
         order_ioss_totals = {}
+        # 循环内频繁使用的方法绑定为局部变量
+        get_product = product_data.get
+        log_info = logger.info
+        log_warning = logger.warning
 
         for order_number, order_list in grouped_orders.items():
             total_order_price = 0.0
             # 计算产品总价
             for order in order_list:
+                uniform_cost_price = order.uniform_cost_price
+                quantity = order.quantity
+                sku = order.sku
                 # 优先使用uniform_cost_price，如果有值的话
-                if order.uniform_cost_price > 0:
-                    total_order_price += order.uniform_cost_price * order.quantity
-                    logger.info(f"使用统一成本价: {order.sku}, 单价: {order.uniform_cost_price}, 数量: {order.quantity}")
-                elif order.sku in product_data:
-                    # 否则使用product_data中的价格
-                    price = product_data[order.sku]['price']
-                    total_order_price += price * order.quantity
+                if uniform_cost_price > 0:
+                    total_order_price += uniform_cost_price * quantity
+                    log_info("使用统一成本价: %s, 单价: %s, 数量: %s", sku, uniform_cost_price, quantity)
+                    continue
+                # 否则使用product_data中的价格
+                record = get_product(sku)
+                if record is not None:
+                    total_order_price += record.price * quantity
                 else:
-                    logger.warning(f"未找到SKU '{order.sku}' 的价格信息")
+                    log_warning("未找到SKU '%s' 的价格信息", sku)
 
             order_product_totals[order_number] = total_order_price
-            logger.info(f"订单 '{order_number}' 的产品价格总和: {total_order_price:.2f} 元")
+            log_info("订单 '%s' 的产品价格总和: %.2f 元", order_number, total_order_price)
 
-            # 计算IOSS费用
-            if total_order_price > 0 and ioss_available:
-                ioss_cost = total_order_price * (ioss_rule.vat_rate + ioss_rule.service_rate)
+            # 计算IOSS费用（国家规则不存在时综合费率为0）
+            if total_order_price > 0:
+                ioss_cost = total_order_price * ioss_factor
                 order_ioss_totals[order_number] = round(ioss_cost, 2)
-                logger.info(f"订单 '{order_number}' 的IOSS费用: {ioss_cost:.2f} 元")
+                log_info("订单 '%s' 的IOSS费用: %.2f 元", order_number, ioss_cost)
             else:
                 order_ioss_totals[order_number] = 0.0
-                if total_order_price <= 0:
-                    logger.warning(f"订单 '{order_number}' 的产品总价无效: {total_order_price}")
-                else:
-                    logger.info(f"订单 '{order_number}' 未计算IOSS费用: 国家规则不存在")
+                log_warning("订单 '%s' 的产品总价无效: %s", order_number, total_order_price)
 
         return order_product_totals, order_ioss_totals
 
-    def create_invoices(self, orders: List[Order], order_totals: Dict[str, float], order_ioss_totals: Dict[str, float], shipping_cost_map: Dict[str, float]) -> List[Invoice]:
+    def create_invoices(self, grouped_orders: Dict[str, List[Order]], order_totals: Dict[str, float], order_ioss_totals: Dict[str, float], shipping_cost_map: Dict[str, float]) -> List[Invoice]:
         """创建发票对象列表
 
         Args:
-            orders: 订单对象列表
+            grouped_orders: 已按交易编号分组的订单(见group_orders_by_number)
             order_totals: 每个订单的产品价格总和字典
             order_ioss_totals: 每个订单的IOSS费用字典
+            shipping_cost_map: 每个订单的实际运费字典
 
         Returns:
             发票对象列表
         """
-        # 按交易编号分组订单
-        grouped_orders = self._group_orders_by_number(orders)
+        # 每个交易编号取第一个订单的国家信息
+        order_countries = {order_number: order_list[0].country if order_list else ''
+                           for order_number, order_list in grouped_orders.items()}
 
-        # 创建发票对象
+        # 创建发票对象(循环内频繁使用的方法绑定为局部变量)
         invoices = []
-        for order_number, order_list in grouped_orders.items():
-            # 取第一个订单的国家信息
-            country = order_list[0].country if order_list else ''
+        add_invoice = invoices.append
+        get_product_cost = order_totals.get
+        get_ioss_cost = order_ioss_totals.get
+        get_shipping_cost = shipping_cost_map.get
+        for order_number, country in order_countries.items():
             # 获取产品总价
-            product_cost = order_totals.get(order_number, 0.0)
+            product_cost = get_product_cost(order_number, 0.0)
             # 获取IOSS费用
-            ioss_cost = order_ioss_totals.get(order_number, 0.0)
+            ioss_cost = get_ioss_cost(order_number, 0.0)
             # 获取并验证运费
-            shipping_cost = shipping_cost_map.get(order_number, 0.0)
+            shipping_cost = get_shipping_cost(order_number, 0.0)
             
             # 验证运费值
             if order_number not in shipping_cost_map:
-                logger.warning(f"订单 '{order_number}' 未找到对应的运费记录，将使用默认值0.0")
+                logger.warning("订单 '%s' 未找到对应的运费记录，将使用默认值0.0", order_number)
             elif shipping_cost < 0:
-                logger.error(f"订单 '{order_number}' 的运费值为负数 ({shipping_cost})，已修正为0.0")
+                logger.error("订单 '%s' 的运费值为负数 (%s)，已修正为0.0", order_number, shipping_cost)
                 shipping_cost = 0.0
             
             # 创建发票
@@ -379,8 +466,39 @@ class Calculator:
             )
             
             # 计算总费用
-            invoice.total_charges = invoice.product_cost + invoice.shipping_cost + invoice.ioss_cost + invoice.redelivery_cost
-            invoices.append(invoice)
-            logger.info(f"已创建发票: 订单编号 '{order_number}', 产品成本: {product_cost:.2f} 元, IOSS成本: {ioss_cost:.2f} 元, 总费用: {invoice.total_charges:.2f} 元")
-
-        return invoices
\ No newline at end of file
+            invoice.total_charges = product_cost + shipping_cost + ioss_cost + invoice.redelivery_cost
+            add_invoice(invoice)
+            logger.info("已创建发票: 订单编号 '%s', 产品成本: %.2f 元, IOSS成本: %.2f 元, 总费用: %.2f 元",
+                        order_number, product_cost, ioss_cost, invoice.total_charges)
+
+        return invoices
+
+# 按配置缓存Calculator实例，避免每次请求重复初始化各数据获取器
+_calculator_cache: Dict[tuple, Calculator] = {}
+_calculator_lock = threading.Lock()
+
+def get_calculator(config: AppConfig) -> Calculator:
+    """获取与配置对应的Calculator实例(同一配置复用同一实例)"""
+    # AppConfig不可哈希，按数据源相关字段生成缓存键
+    google_sheets = config.google_sheets
+    key = (
+        config.data_source,
+        config.excel_path,
+        google_sheets.get('document_id'),
+        google_sheets.get('sheet_name'),
+        google_sheets.get('credentials_path'),
+        config.google_sheets_shipping_sheet_name,
+        config.google_sheets_ioss_sheet_name,
+        config.required_columns,
+        config.ioss_country_column,
+        config.ioss_vat_rate_column,
+        config.ioss_service_rate_column,
+    )
+    calculator = _calculator_cache.get(key)
+    if calculator is None:
+        with _calculator_lock:
+            # 获取锁后再次检查，避免并发的首次请求各自创建实例
+            calculator = _calculator_cache.get(key)
+            if calculator is None:
+                calculator = _calculator_cache[key] = Calculator(config)
+    return calculator
@@ -1,19 +1,20 @@
 import os
+import functools
 from dataclasses import dataclass
 from dotenv import load_dotenv
 
 # 加载.env文件
 load_dotenv()
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class AppConfig:
-    """应用程序配置"""
+    """应用程序配置(只读，由load_config缓存后在各模块间共享)"""
     # 数据源配置
     data_source: str
     
     # Excel配置
     excel_path: str
-    required_columns: list[str]
+    required_columns: tuple[str, ...]
     product_column: str
     price_column: str
     attribute_column: str
@@ -40,12 +41,21 @@ class AppConfig:
     ioss_vat_rate_column: str
     ioss_service_rate_column: str
     
+    # IOSS税率规则缓存有效期(秒)，进程内和本地缓存过期后重新加载，0表示不缓存
+    ioss_cache_ttl_seconds: int
+    
+    # Google Sheets产品数据和运费规则缓存有效期(秒)，进程内和本地缓存过期后重新加载，0表示不缓存
+    sheets_cache_ttl_seconds: int
+    # 本地缓存目录(仅当前用户可访问)
+    cache_dir: str
+    
     # 应用信息
     app_version: str
     title: str
 
+@functools.lru_cache(maxsize=1)
 def load_config() -> AppConfig:
-    """加载应用配置"""
+    """加载应用配置(仅在首次调用时读取环境变量)"""
     current_dir = os.path.dirname(os.path.abspath(__file__))
     
     # 从环境变量加载配置
@@ -64,7 +74,7 @@ def load_config() -> AppConfig:
     height_column = os.getenv('HEIGHT_COLUMN', '高')
     ioss_price_column = os.getenv('IOSS_PRICE_COLUMN', 'IOSS价格')
     image_url_column = os.getenv('IMAGE_URL_COLUMN', '产品图片地址')
-    required_columns = [product_column, price_column, attribute_column, weight_column, length_column, width_column, height_column, ioss_price_column, image_url_column]
+    required_columns = (product_column, price_column, attribute_column, weight_column, length_column, width_column, height_column, ioss_price_column, image_url_column)
     
     # Google Sheets配置
     google_sheets_document_id = os.getenv('GOOGLE_SHEETS_DOCUMENT_ID', '1Lrulu0_QClveyiXQHcgMknHYQMkwr-qE-EATwc0A2iQ')
@@ -77,6 +87,11 @@ def load_config() -> AppConfig:
     ioss_country_column = os.getenv('IOSS_COUNTRY_COLUMN', '国家')
     ioss_vat_rate_column = os.getenv('IOSS_VAT_RATE_COLUMN', 'VAT税率')
     ioss_service_rate_column = os.getenv('IOSS_SERVICE_RATE_COLUMN', '服务费率')
+    ioss_cache_ttl_seconds = int(os.getenv('IOSS_CACHE_TTL_SECONDS', '3600'))
+    sheets_cache_ttl_seconds = int(os.getenv('SHEETS_CACHE_TTL_SECONDS', '300'))
+    # 本地缓存目录，默认为当前用户的缓存目录(不使用所有用户共享的系统临时目录)
+    cache_dir = os.getenv('CACHE_DIR') or os.path.join(
+        os.getenv('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'), 'inquiry-tool')
     
     # 订单Excel列名映射
     order_excel_columns = {
@@ -132,6 +147,9 @@ def load_config() -> AppConfig:
         google_sheets_ioss_sheet_name=google_sheets_ioss_sheet_name,
         ioss_country_column=ioss_country_column,
         ioss_vat_rate_column=ioss_vat_rate_column,
-        ioss_service_rate_column=ioss_service_rate_column
+        ioss_service_rate_column=ioss_service_rate_column,
+        ioss_cache_ttl_seconds=ioss_cache_ttl_seconds,
+        sheets_cache_ttl_seconds=sheets_cache_ttl_seconds,
+        cache_dir=cache_dir
     )
     return config
\ No newline at end of file
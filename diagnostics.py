@@ -1,13 +1,12 @@
 import sys
-import pkg_resources
+from importlib.metadata import version, PackageNotFoundError
 
 def print_env_info():
     print("=== Python & Package Diagnostics ===")
     print("Python:", sys.version)
-    for pkg in ["gradio", "gradio_client", "fastapi","pandas", "openpyxl", "gspread", "google-auth", "pydantic"]:
+    for pkg in ["gradio", "gradio_client", "fastapi","pandas", "openpyxl", "python-calamine", "gspread", "google-auth", "pydantic"]:
         try:
-            version = pkg_resources.get_distribution(pkg).version
-            print(f"{pkg}: {version}")
-        except pkg_resources.DistributionNotFound:
+            print(f"{pkg}: {version(pkg)}")
+        except PackageNotFoundError:
             print(f"{pkg}: not installed")
     print("====================================")
\ No newline at end of file
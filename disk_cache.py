@@ -0,0 +1,77 @@
+import os
+import stat
+import time
+import pickle
+import hashlib
+import tempfile
+import logging
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# 只有POSIX系统才能按属主和权限位校验缓存文件(Windows下由用户目录的ACL保护)
+_CHECK_OWNER = hasattr(os, 'getuid')
+
+def _is_private(st: os.stat_result) -> bool:
+    """文件或目录属于当前用户，且同组和其他用户不可写"""
+    if not _CHECK_OWNER:
+        return True
+    return st.st_uid == os.getuid() and not st.st_mode & (stat.S_IWGRP | stat.S_IWOTH)
+
+def _ensure_cache_dir(cache_dir: str) -> bool:
+    """创建仅当前用户可访问的缓存目录(0o700)，目录已存在但不安全时返回False"""
+    try:
+        os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+        st = os.stat(cache_dir)
+    except OSError as e:
+        logger.warning("无法创建本地缓存目录，不使用本地缓存: %s (%s)", cache_dir, e)
+        return False
+    if not _is_private(st):
+        logger.warning("本地缓存目录不属于当前用户或其他用户可写，不使用本地缓存: %s", cache_dir)
+        return False
+    return True
+
+def cache_path(cache_dir: str, prefix: str, *key_parts: str) -> str:
+    """根据键生成缓存文件路径(位于当前用户私有的缓存目录，跨进程稳定)"""
+    digest = hashlib.sha1('\x00'.join(key_parts).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(cache_dir, f"{prefix}_{digest}.pkl")
+
+def load(path: str, ttl_seconds: Optional[float]) -> Optional[Any]:
+    """读取未过期的缓存文件，不存在、已过期、损坏或不安全时返回None
+
+    ttl_seconds为None时缓存不过期(适用于键中已包含源文件修改时间的缓存)
+    只读取属于当前用户且其他用户不可写的文件，避免反序列化他人放置的pickle文件
+    """
+    if ttl_seconds is not None and ttl_seconds <= 0:
+        return None
+    try:
+        with open(path, 'rb') as f:
+            st = os.fstat(f.fileno())
+            if not (_is_private(st) and _is_private(os.stat(os.path.dirname(path)))):
+                logger.warning("本地缓存文件不属于当前用户或其他用户可写，已忽略: %s", path)
+                return None
+            if ttl_seconds is not None and time.time() - st.st_mtime >= ttl_seconds:
+                return None
+            return pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning("读取本地缓存失败，将重新加载: %s (%s)", path, e)
+        return None
+
+def save(path: str, value: Any) -> None:
+    """写入缓存文件：先写临时文件再原子替换，多个进程同时写入也不会读到不完整的文件"""
+    if not _ensure_cache_dir(os.path.dirname(path)):
+        return
+    try:
+        # mkstemp创建的临时文件权限为0o600
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=os.path.basename(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    except Exception as e:
+        logger.warning("写入本地缓存失败: %s (%s)", path, e)
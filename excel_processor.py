@@ -1,8 +1,8 @@
 import os
 import pandas as pd
 import logging
-from order_fetcher import OrderFetcher, ShippingOrderFetcher
-from calculator import Calculator
+from order_fetcher import OrderFetcher, ShippingOrderFetcher, read_excel_columns
+from calculator import get_calculator
 from output_formatter import OutputFormatter
 
 logger = logging.getLogger(__name__)
@@ -23,13 +23,30 @@ def validate_excel_files(product_excel_file, shipping_excel_file):
     return True, ""
 
 def load_excel_data(config, product_excel_file, shipping_excel_file):
-    logger.info("开始加载订单数据...")
     order_fetcher = OrderFetcher(config)
+    shipping_fetcher = ShippingOrderFetcher(config)
+
+    if os.path.samefile(product_excel_file, shipping_excel_file):
+        # 订单与物流数据在同一文件中时只读取一次
+        logger.info("订单与物流数据使用同一Excel文件，只读取一次...")
+        order_columns = config.order_excel_columns
+        shipping_columns = config.shipping_excel_columns
+        df = read_excel_columns(
+            product_excel_file,
+            [*order_columns.values(), *shipping_columns.values()],
+            [*order_fetcher.text_columns(), *shipping_fetcher.text_columns()]
+        )
+        orders = order_fetcher.load_orders_from_dataframe(df)
+        logger.info(f"成功加载 {len(orders)} 条订单数据")
+        shipping_orders = shipping_fetcher.load_shipping_orders_from_dataframe(df)
+        logger.info(f"成功加载 {len(shipping_orders)} 条物流数据")
+        return orders, shipping_orders
+
+    logger.info("开始加载订单数据...")
     orders = order_fetcher.load_orders_from_excel(product_excel_file)
     logger.info(f"成功加载 {len(orders)} 条订单数据")
 
     logger.info("开始加载物流数据...")
-    shipping_fetcher = ShippingOrderFetcher(config)
     shipping_orders = shipping_fetcher.load_shipping_orders_from_excel(shipping_excel_file)
     logger.info(f"成功加载 {len(shipping_orders)} 条物流数据")
     return orders, shipping_orders
@@ -37,10 +54,12 @@ def load_excel_data(config, product_excel_file, shipping_excel_file):
 def process_results(config, orders, shipping_orders, exchange_rate):
     shipping_cost_map = {order.order_number: order.actual_shipping_fee for order in shipping_orders}
     logger.info("开始生成发票...")
-    calculator = Calculator(config)
+    calculator = get_calculator(config)
+    # 只分组一次，供订单总计和发票创建共用
+    grouped_orders = calculator.group_orders_by_number(orders)
     # 计算订单总计和IOSS税费
-    order_totals, order_ioss_totals = calculator.calculate_order_totals(orders)
-    invoices = calculator.create_invoices(orders, order_totals, order_ioss_totals, shipping_cost_map)
+    order_totals, order_ioss_totals = calculator.calculate_order_totals(orders, grouped_orders)
+    invoices = calculator.create_invoices(grouped_orders, order_totals, order_ioss_totals, shipping_cost_map)
     logger.info(f"成功生成 {len(invoices)} 张发票")
 
     result_msg = f"处理完成。共生成 {len(invoices)} 张发票。"
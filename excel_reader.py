@@ -0,0 +1,16 @@
+import logging
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+def read_excel(file_path: str, **kwargs) -> pd.DataFrame:
+    """读取Excel文件：优先使用calamine(Rust实现，解析xlsx/xls比openpyxl快数倍)，
+    未安装python-calamine时退回到pandas默认引擎(xlsx为openpyxl)
+
+    其余参数原样传给pd.read_excel
+    """
+    try:
+        return pd.read_excel(file_path, engine='calamine', **kwargs)
+    except ImportError:
+        logger.warning("未安装python-calamine，使用pandas默认引擎读取Excel文件: %s", file_path)
+        return pd.read_excel(file_path, **kwargs)
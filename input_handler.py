@@ -1,5 +1,43 @@
+import functools
+import re
 from models import Product
-from typing import List
+from typing import List, Tuple
+
+# 单行产品信息"SKU,数量"(恰好一个逗号)，SKU两侧的空白不计入
+_PRODUCT_LINE_RE = re.compile(r'^[^\S\n]*([^,\n]*?)[^\S\n]*,([^,\n]*)$', re.M)
+
+@functools.lru_cache(maxsize=32)
+def _parse_product_lines(input_text: str) -> Tuple[Tuple[str, float], ...]:
+    """将文本解析为(SKU, 数量)元组，同一文本重复提交时直接使用缓存结果"""
+    # 替换中文逗号为英文逗号(对整段文本只做一次)
+    text = input_text.replace('，', ',').strip()
+    lines = text.splitlines()
+
+    # 先用正则一次匹配全部行；每个非空行都匹配成功时直接返回
+    matches = _PRODUCT_LINE_RE.findall(text)
+    if len(matches) == sum(1 for line in lines if line.strip()):
+        try:
+            # float()会自行忽略首尾空白
+            return tuple((name, float(quantity_text)) for name, quantity_text in matches)
+        except ValueError:
+            pass
+
+    # 存在格式错误的行时逐行解析，给出具体的出错行
+    items = []
+    for line in lines:
+        if not line.strip():
+            continue
+        parts = line.split(',')
+        if len(parts) != 2:
+            raise ValueError(f"格式错误：{line}。请使用'SKU,数量'的格式。例如：APL-001,2")
+        name, quantity_text = parts
+        try:
+            # float()会自行忽略首尾空白
+            quantity = float(quantity_text)
+        except ValueError as e:
+            raise ValueError(f"数据错误：{str(e)}。数量必须是数字。")
+        items.append((name.strip(), quantity))
+    return tuple(items)
 
 class InputHandler:
     """用户输入处理器"""
@@ -42,29 +80,9 @@ class InputHandler:
     @staticmethod
     def parse_products_from_text(input_text: str) -> List[Product]:
         """从文本输入解析产品信息列表"""
-        products = []
-        lines = input_text.strip().split('\n')
-        for line in lines:
-            if not line.strip():
-                continue
-            # 替换中文逗号为英文逗号
-            line = line.replace('，', ',')
-            parts = line.split(',')
-            if len(parts) != 2:
-                raise ValueError(f"格式错误：{line}。请使用'SKU,数量'的格式。例如：APL-001,2")
-            name = parts[0].strip()
-            try:
-                quantity = float(parts[1].strip())
-                products.append(Product(
-                    sku=name, 
-                    quantity=quantity,
-                    weight=0.0,
-                    attribute="",
-                ))
-            except ValueError as e:
-                raise ValueError(f"数据错误：{str(e)}。数量必须是数字。")
-        
-        return products
+        # 解析结果按文本缓存，每次返回新的Product对象(后续计算会修改产品字段)
+        return [Product(sku=sku, quantity=quantity, weight=0.0, attribute="")
+                for sku, quantity in _parse_product_lines(input_text)]
     
     @staticmethod
     def _get_valid_quantity() -> float:
@@ -1,15 +1,25 @@
-import gspread
-from google.oauth2.service_account import Credentials
+import pandas as pd
 from models import IossRule
-from typing import List, Optional
+from typing import Dict, List, Optional
+import re
+import sys
+import time
+import functools
+import threading
 import logging
-import os
 from config import AppConfig
+from sheets_client import get_sheets_client
+import disk_cache
 
 # 配置日志
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 税率单元格：数值部分，可带百分号和首尾空白(如" 19% ")
+_RATE_RE = re.compile(r'^\s*([^%\s]*)\s*%?\s*$')
+
+# 本地缓存文件的格式版本
+_CACHE_FORMAT_VERSION = '2'
+
 class IossDataSource:
     """IOSS税率数据源抽象基类"""
     def load_rules(self) -> List[IossRule]:
@@ -24,107 +34,139 @@ class GoogleSheetsIossSource(IossDataSource):
         self.country_column = config.ioss_country_column
         self.vat_rate_column = config.ioss_vat_rate_column
         self.service_rate_column = config.ioss_service_rate_column
+        self.sheets_client = get_sheets_client(config)
+        # 本地缓存文件按格式版本、文档、工作表和列名区分(IossRule字段变化时需更新版本)
+        self.cache_ttl_seconds = config.ioss_cache_ttl_seconds
+        self.cache_path = disk_cache.cache_path(config.cache_dir, 'ioss_rules', _CACHE_FORMAT_VERSION, self.document_id,
+                                                self.sheet_name, self.country_column, self.vat_rate_column,
+                                                self.service_rate_column)
         self.ioss_rules: Optional[List[IossRule]] = None
 
-    def get_credentials(self):
-        """获取Google认证凭证"""
-        # 检查是否有GOOGLE_APPLICATION_CREDENTIALS环境变量
-        env_credentials_path = os.getenv('GOOGLE_APPLICATION_CREDENTIALS')
-        if env_credentials_path:
-            logger.info(f"使用环境变量GOOGLE_APPLICATION_CREDENTIALS指定的凭证路径: {env_credentials_path}")
-            return Credentials.from_service_account_file(
-                env_credentials_path,
-                scopes=['https://www.googleapis.com/auth/spreadsheets.readonly']
-            )
-        else:
-            logger.info(f"使用配置中的凭证路径: {self.credentials_path}")
-            return Credentials.from_service_account_file(
-                self.credentials_path,
-                scopes=['https://www.googleapis.com/auth/spreadsheets.readonly']
-            )
-
     def load_rules(self) -> List[IossRule]:
-        """加载Google Sheets中的IOSS税率规则"""
-        if self.ioss_rules is not None:
+        """加载Google Sheets中的IOSS税率规则(每次调用都重新加载，进程内缓存由IossFetcher按有效期管理)"""
+        # 优先使用未过期的本地缓存(进程重启后无需再次请求Google Sheets)
+        cached_rules = disk_cache.load(self.cache_path, self.cache_ttl_seconds)
+        if cached_rules:
+            logger.info("从本地缓存加载%s条IOSS税率规则: %s", len(cached_rules), self.cache_path)
+            self.ioss_rules = cached_rules
             return self.ioss_rules
 
+        # gspread导入较慢，只在需要请求Google Sheets时才导入(本地缓存命中时无需加载)
+        import gspread
         try:
-            logger.info(f"开始从Google Sheets加载IOSS税率规则: {self.document_id} - {self.sheet_name}")
-
-            # 加载凭证并授权
-            credentials = self.get_credentials()
-            client = gspread.authorize(credentials)
+            logger.info("开始从Google Sheets加载IOSS税率规则: %s - %s", self.document_id, self.sheet_name)
 
-            # 打开表格并获取数据
-            sheet = client.open_by_key(self.document_id).worksheet(self.sheet_name)
-            data = sheet.get_all_records()
+            # 获取工作表数据(与同一文档的其他工作表批量读取，取回二维数组，避免逐行构建字典)
+            rows = self.sheets_client.get_values(self.sheet_name)
 
-            if not data:
+            if len(rows) < 2:
                 raise ValueError("Google Sheets中没有找到IOSS税率规则数据")
 
             # 验证必要列是否存在
+            header = rows[0]
             required_columns = [
                 self.country_column,
                 self.vat_rate_column,
                 self.service_rate_column
             ]
-            if not all(col in data[0] for col in required_columns):
-                missing_cols = [col for col in required_columns if col not in data[0]]
+            missing_cols = [col for col in required_columns if col not in header]
+            if missing_cols:
                 raise ValueError(f"Google Sheets缺少必要列: {missing_cols}")
 
+            # 只取需要的三列(按列位置)，行尾缺失的单元格补为空字符串
+            positions = [header.index(col) for col in required_columns]
+            df = pd.DataFrame(rows[1:]).reindex(columns=positions).fillna('').astype(str)
+            df.columns = ['country', 'vat_rate', 'service_rate']
+
+            # 向量化处理带百分号的税率值：空值按0处理，无法解析的行跳过
+            df['country'] = df['country'].str.strip()
+            for col in ('vat_rate', 'service_rate'):
+                rate_str = df[col].str.extract(_RATE_RE, expand=False)
+                rate = pd.to_numeric(rate_str, errors='coerce')
+                rate[rate_str == ''] = 0.0
+                df[col] = rate
+            invalid = df[['vat_rate', 'service_rate']].isna().any(axis=1)
+            for idx in invalid[invalid].index:
+                logger.warning("行数据无效，已跳过: %s. 错误: 税率无法转换为数字", rows[idx + 1])
+
             # 转换为IossRule列表并缓存
-            self.ioss_rules = []
-            for row in data:
-                try:
-                    # 处理带百分号的税率值
-                    vat_rate_str = str(row[self.vat_rate_column]).replace('%', '').strip()
-                    service_rate_str = str(row[self.service_rate_column]).replace('%', '').strip()
-                    
-                    rule = IossRule(
-                        country=row[self.country_column],
-                        vat_rate=float(vat_rate_str) if vat_rate_str else 0.0,
-                        service_rate=float(service_rate_str) if service_rate_str else 0.0
-                    )
-                    self.ioss_rules.append(rule)
-                except (ValueError, TypeError) as e:
-                    logger.warning(f"行数据无效，已跳过: {row}. 错误: {str(e)}")
+            self.ioss_rules = [IossRule(country, float(vat_rate), float(service_rate))
+                               for country, vat_rate, service_rate in df[~invalid].itertuples(index=False, name=None)]
 
             if not self.ioss_rules:
                 raise ValueError("没有从Google Sheets中加载到有效的IOSS税率规则数据")
 
-            logger.info(f"成功加载{len(self.ioss_rules)}条IOSS税率规则")
+            logger.info("成功加载%s条IOSS税率规则", len(self.ioss_rules))
+            if self.cache_ttl_seconds > 0:
+                disk_cache.save(self.cache_path, self.ioss_rules)
             return self.ioss_rules
 
         except FileNotFoundError:
-            logger.error(f"凭证文件未找到: {self.credentials_path}")
+            logger.error("凭证文件未找到: %s", self.credentials_path)
             raise
         except gspread.exceptions.SpreadsheetNotFound:
-            logger.error(f"找不到指定的Google Sheets文档: {self.document_id}")
+            logger.error("找不到指定的Google Sheets文档: %s", self.document_id)
             raise
         except gspread.exceptions.WorksheetNotFound:
-            logger.error(f"在文档中找不到指定的工作表: {self.sheet_name}")
+            logger.error("在文档中找不到指定的工作表: %s", self.sheet_name)
             raise
         except Exception as e:
-            logger.error(f"加载Google Sheets IOSS税率规则失败: {str(e)}", exc_info=True)
+            logger.error("加载Google Sheets IOSS税率规则失败: %s", e, exc_info=True)
             raise
 
+def _make_rule_lookup(by_country: Dict[str, IossRule]):
+    """生成按国家(小写)查询税率规则的函数，查询结果缓存在该规则集对应的lru_cache中"""
+    @functools.lru_cache(maxsize=256)
+    def find_rule(country_key: str) -> Optional[IossRule]:
+        rule = by_country.get(sys.intern(country_key))
+        if rule is None:
+            logger.warning("未找到国家'%s'的IOSS税率规则", country_key)
+        return rule
+    return find_rule
+
 class IossFetcher:
     """IOSS税率查询器"""
     def __init__(self, config: AppConfig):
         self.config = config
         self.data_source = GoogleSheetsIossSource(config)
+        # 进程内缓存有效期(秒)，过期后重新加载，以便表格更新能够生效
+        self.cache_ttl_seconds = config.ioss_cache_ttl_seconds
         self.ioss_rules = None  # 初始化为None，实现懒加载
+        self._loaded_at = 0.0
+        self._load_lock = threading.Lock()
+        self._find_rule = _make_rule_lookup({})
+
+    def _is_fresh(self) -> bool:
+        return self.ioss_rules is not None and time.monotonic() - self._loaded_at < self.cache_ttl_seconds
 
     def _ensure_rules_loaded(self):
-        """确保IOSS税率规则已加载"""
-        if self.ioss_rules is None:
-            self.ioss_rules = self.data_source.load_rules()
+        """确保IOSS税率规则已加载且未过期(并发请求下只加载一次，索引建好后才对外可见)"""
+        if self._is_fresh():
+            return
+        with self._load_lock:
+            # 获取锁后再次检查，避免多个线程同时重复加载
+            if self._is_fresh():
+                return
+            try:
+                ioss_rules = self.data_source.load_rules()
+            except Exception:
+                if self.ioss_rules is None:
+                    raise
+                # 刷新失败时继续使用旧规则，待下一个有效期后再重试
+                logger.warning("刷新IOSS税率规则失败，继续使用已缓存的IOSS税率规则", exc_info=True)
+                self._loaded_at = time.monotonic()
+                return
+            # 按小写国家名建立索引，国家重复时保留第一条规则
+            by_country: Dict[str, IossRule] = {}
+            for rule in ioss_rules:
+                by_country.setdefault(rule.country_key, rule)
+            # 清空旧规则的查询缓存，新规则使用新的查询缓存(并发查询不会把旧结果写入新缓存)
+            self._find_rule.cache_clear()
+            self._find_rule = _make_rule_lookup(by_country)
+            self._loaded_at = time.monotonic()
+            self.ioss_rules = ioss_rules
 
     def get_ioss_rule(self, country: str) -> Optional[IossRule]:
-        """根据国家获取IOSS税率规则"""
+        """根据国家获取IOSS税率规则(规则按有效期刷新)"""
         self._ensure_rules_loaded()  # 调用懒加载方法
-        for rule in self.ioss_rules:
-            if rule.country.lower() == country.lower():
-                return rule
-        logger.warning(f"未找到国家'{country}'的IOSS税率规则")
-        return None
\ No newline at end of file
+        return self._find_rule(country.lower())
@@ -9,40 +9,79 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 from config import load_config
-from dotenv import load_dotenv
 import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from operator import attrgetter
 from ui import create_interface
 from typing import List
 
-# 加载.env文件
-load_dotenv()
-from price_fetcher import PriceFetcher
-from calculator import Calculator
+from price_fetcher import get_price_fetcher
+from calculator import get_calculator
 from excel_processor import validate_excel_files, load_excel_data, process_results
 
 from output_formatter import OutputFormatter
 from input_handler import InputHandler
 
+# 报价结果缓存：相同输入重复查询时直接返回已生成的HTML
+_PRICING_CACHE_SIZE = 128
+_pricing_cache: 'OrderedDict[str, str]' = OrderedDict()
+_pricing_cache_lock = threading.Lock()
+# 参与缓存键的产品字段(不含计算结果字段：运费分摊、IOSS税金、总价)
+_PRICING_PRODUCT_FIELDS = attrgetter('sku', 'quantity', 'weight', 'attribute', 'length', 'width', 'height',
+                                     'price', 'ioss_price', 'image_url', 'actual_weight', 'volume_weight')
+
+def _ioss_rates(calculator, products, destination):
+    """报价用到的IOSS税率(规则按有效期刷新，刷新后缓存键随之变化)；没有产品设置IOSS价格时不查询"""
+    if not any(product.ioss_price > 0 for product in products):
+        return None
+    ioss_rule = calculator.ioss_fetcher.get_ioss_rule(destination)
+    return None if ioss_rule is None else (ioss_rule.vat_rate, ioss_rule.service_rate)
+
+def _pricing_cache_key(products, destination, exchange_rate, selected_shipping_rules, ioss_rates) -> str:
+    """根据报价输入和当前IOSS税率生成缓存键"""
+    payload = json.dumps({
+        'p': [_PRICING_PRODUCT_FIELDS(product) for product in products],
+        'd': destination,
+        'e': exchange_rate,
+        'r': selected_shipping_rules,
+        'i': ioss_rates,
+    }, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=16).hexdigest()
+
 def load_products(input_text, products_state):
+    """解析产品并加载产品数据(生成器：先显示加载提示，数据就绪后再输出产品图片)"""
     try:
         # 使用InputHandler解析产品信息
         products = InputHandler.parse_products_from_text(input_text)
 
         if not products:
-            return "未输入任何产品信息", products_state
+            yield "未输入任何产品信息", products_state
+            return
+
+        # 产品表首次加载可能需要数秒，先显示加载提示
+        yield "<div>正在加载产品数据…</div>", products_state
 
         config = load_config()
         
-        # 获取产品完整数据（价格、重量、尺寸等）
-        price_fetcher = PriceFetcher(config)
+        # 获取产品完整数据（价格、重量、尺寸等），复用同一实例避免每次点击重新加载产品表
+        price_fetcher = get_price_fetcher(config)
         updated_products = price_fetcher.fetch_product_data(products)
         
         # 使用OutputFormatter生成产品图片HTML
         html_images = OutputFormatter.format_product_images(updated_products)
 
-        return html_images, updated_products
+        yield html_images, updated_products
     except Exception as e:
-        return f"处理错误: {str(e)}"
+        # 两个输出都需要返回值，出错时保留原有产品数据
+        yield f"处理错误: {str(e)}", products_state
+
+# 运费规则选项的显示模板
+_SHIPPING_CHOICE_TEMPLATE = ("{shipping_company} | 目的地: {country} | 区域: {region} | 货物属性: {attribute} | "
+                             "首重: {first_weight}g/{first_weight_fee}元 | 续重: {additional_weight}g/{additional_weight_price}元 | "
+                             "时效: {min_delivery_days}-{max_delivery_days}天 | 挂号费: {registration_fee}元/票")
 
 def load_shipping_rules(destination, volume_weight_ratio, products_state):
     try:
@@ -55,43 +94,37 @@ def load_shipping_rules(destination, volume_weight_ratio, products_state):
             return [], {}
 
         config = load_config()
-        calculator_instance = Calculator(config)
+        calculator_instance = get_calculator(config)
         
         # 调用方法获得匹配的运费规则
         data = calculator_instance.find_applicable_shipping_rules(products_state, destination, volume_weight_ratio)
-        logger.info(f"find_applicable_shipping_rules返回数据类型: {type(data)}, 数据长度: {len(data)}")
+        logger.info("find_applicable_shipping_rules返回数据类型: %s, 数据长度: %s", type(data), len(data))
         if data:
-            logger.info(f"返回数据第一项: {data[0]}")
+            logger.info("返回数据第一项: %s", data[0])
         
-        # 初始化变量
-        choices = []
-        id_map = {}  # 用来把唯一值映射回原数据
-        
-        for item in data:
-            display_text = f"{item['shipping_company']} | 目的地: {item['country']} | 区域: {item['region']} | 货物属性: {item['attribute']} | 首重: {item['first_weight']}g/{item['first_weight_fee']}元 | 续重: {item['additional_weight']}g/{item['additional_weight_price']}元 | 时效: {item['min_delivery_days']}-{item['max_delivery_days']}天 | 挂号费: {item['registration_fee']}元/票"
-            value_id = f"{item['shipping_company']}_{item['id']}"  # 唯一 ID
-            choices.append((display_text, value_id))
-            id_map[value_id] = item
-            logger.debug(f"添加到id_map的键: {value_id}, 类型: {type(value_id)}")
-        logger.info(f"生成的choices数量: {len(choices)}, id_map键数量: {len(id_map.keys())}")
+        # 生成选项(显示文本, 唯一ID)，并用唯一ID映射回原数据
+        value_ids = [f"{item['shipping_company']}_{item['id']}" for item in data]
+        choices = [(_SHIPPING_CHOICE_TEMPLATE.format_map(item), value_id) for item, value_id in zip(data, value_ids)]
+        id_map = dict(zip(value_ids, data))
+        logger.info("生成的choices数量: %s, id_map键数量: %s", len(choices), len(id_map))
         return gr.update(choices=choices, value=[]), id_map
     except Exception as e:
         logger.error(f"运输规则处理错误: {str(e)}")
         return [], {}
 
 def show_selection(selected_ids, id_map):
-    logger.info(f"show_selection被调用，selected_ids类型: {type(selected_ids)}, 值: {selected_ids}")
+    logger.info("show_selection被调用，selected_ids类型: %s, 值: %s", type(selected_ids), selected_ids)
     if not selected_ids:
         return "你没有选择任何公司", None
     results = []
     selected_rule = None
     # 确保selected_ids是列表
     if not isinstance(selected_ids, list):
-        logger.info(f"将selected_ids从{type(selected_ids)}转换为列表")
+        logger.info("将selected_ids从%s转换为列表", type(selected_ids))
         selected_ids = [selected_ids]
     # 使用ID列表
     for sid in selected_ids:
-        logger.info(f"遍历ID列表，当前sid类型: {type(sid)}, 值: {sid}")
+        logger.debug("遍历ID列表，当前sid类型: %s, 值: %s", type(sid), sid)
         if sid in id_map:
             item = id_map[sid]
             results.append(f"{item['shipping_company']}, {item['country']}, {item['region']}, {item['attribute']} - 首重: {item['first_weight']}g/{item['first_weight_fee']}元, 续重: {item['additional_weight']}g/{item['additional_weight_price']}元, 挂号费: {item['registration_fee']}元/票, 时效: {item['min_delivery_days']}-{item['max_delivery_days']}天")
@@ -143,9 +176,19 @@ def check_pricing(destination, exchange_rate, selected_shipping_rules, products_
             return f"内部错误: 运费规则格式不正确"
 
         config = load_config()
-        
+        calculator = get_calculator(config)
+
+        # 输入和IOSS税率均未变化时直接返回上次的报价结果
+        ioss_rates = _ioss_rates(calculator, products_state, destination)
+        cache_key = _pricing_cache_key(products_state, destination, exchange_rate, selected_shipping_rules, ioss_rates)
+        with _pricing_cache_lock:
+            html_result = _pricing_cache.get(cache_key)
+            if html_result is not None:
+                _pricing_cache.move_to_end(cache_key)
+                logger.info("报价输入未变化，使用缓存结果")
+                return html_result
+
         # 计算总价（包含总运费和IOSS税金）
-        calculator = Calculator(config)
         # 传递用户选择的运费规则到计算函数
         result, rule_info, ioss_info = calculator.calculate_totals(
             products_state, 
@@ -156,6 +199,11 @@ def check_pricing(destination, exchange_rate, selected_shipping_rules, products_
         # 使用OutputFormatter生成HTML格式的结果
         html_result = OutputFormatter.format_results_as_html(result, destination, [rule_info], [ioss_info], exchange_rate)
 
+        with _pricing_cache_lock:
+            _pricing_cache[cache_key] = html_result
+            if len(_pricing_cache) > _PRICING_CACHE_SIZE:
+                _pricing_cache.popitem(last=False)
+
         return html_result
     except Exception as e:
         return f"处理错误: {str(e)}"
@@ -164,7 +212,6 @@ if __name__ == "__main__":
     # 诊断Render部署脚本
     from diagnostics import print_env_info
     print_env_info()
-    logging.basicConfig(level=logging.INFO)
     interface = create_interface()
     server_name = os.getenv('SERVER_NAME', '0.0.0.0')
     server_port = int(os.getenv('SERVER_PORT', '7860'))
@@ -1,6 +1,9 @@
-from dataclasses import dataclass
+import sys
+from dataclasses import dataclass, field
+from operator import attrgetter
+import numpy as np
 
-@dataclass
+@dataclass(slots=True)
 class Product:
     """产品数据模型"""
     sku: str
@@ -14,11 +17,49 @@ class Product:
     ioss_price: float = 0.0  # IOSS价格
     image_url: str = ""  # 产品图片地址
     shipping_fee: float = 0.0  # 运费
+    ioss_tax: float = 0.0  # IOSS税金
     total: float = 0.0
     actual_weight: float = 0.0  # 实际重量(g)
     volume_weight: float = 0.0  # 体积重量(g)
 
-@dataclass
+@dataclass(slots=True)
+class ProductRecord:
+    """产品表中一个产品的数据(价格、属性、重量、尺寸等)"""
+    price: float
+    attribute: str  # 产品属性(如: 带电)
+    weight: float  # 单个产品重量(g)
+    length: float  # 长度(cm)
+    width: float  # 宽度(cm)
+    height: float  # 高度(cm)
+    ioss_price: float  # IOSS价格
+    image_url: str = ""  # 产品图片地址
+
+# ProductBatch按列提取的产品数值字段
+_BATCH_FIELDS = ('quantity', 'weight', 'length', 'width', 'height', 'price', 'ioss_price')
+_get_batch_fields = attrgetter(*_BATCH_FIELDS)
+
+@dataclass(slots=True)
+class ProductBatch:
+    """产品批量数据(按列存储的数组)，用于向量化计算重量、总价和IOSS税金"""
+    skus: list[str]
+    quantity: np.ndarray
+    weight: np.ndarray  # 单个产品重量(g)
+    length: np.ndarray  # 长度(cm)
+    width: np.ndarray  # 宽度(cm)
+    height: np.ndarray  # 高度(cm)
+    price: np.ndarray
+    ioss_price: np.ndarray  # IOSS价格
+
+    @classmethod
+    def from_products(cls, products: list[Product]) -> 'ProductBatch':
+        """一次遍历产品列表，按列拆分为数组"""
+        columns = np.array([_get_batch_fields(product) for product in products], dtype=np.float64)
+        return cls([product.sku for product in products], *columns.reshape(-1, len(_BATCH_FIELDS)).T)
+
+    def __len__(self) -> int:
+        return len(self.skus)
+
+@dataclass(slots=True)
 class ShippingRule:
     """运费规则数据模型"""
     shipping_company: str  # 货代公司
@@ -34,15 +75,42 @@ class ShippingRule:
     min_delivery_days: int  # 时效最早天数
     max_delivery_days: int  # 时效最晚天数
     registration_fee: float  # 挂号费(RMB/票)
+    country_key: str = field(init=False, repr=False, compare=False)  # 国家(小写，用于匹配)
+    attribute_key: str = field(init=False, repr=False, compare=False)  # 货物属性(小写，用于匹配)
+
+    def __post_init__(self):
+        # 驻留匹配键，字典查找时可直接按对象identity比较
+        self.country_key = sys.intern(self.country.lower())
+        self.attribute_key = sys.intern(self.attribute.lower())
 
-@dataclass
+@dataclass(slots=True)
+class ShippingRuleInfo:
+    """运费计算所用规则信息(用于结果展示)"""
+    shipping_company: str = ""  # 货代公司
+    region: str = ""  # 区域
+    estimated_delivery_time: str = ""  # 参考时效
+    min_delivery_days: int = 0  # 时效最早天数
+    max_delivery_days: int = 0  # 时效最晚天数
+    first_weight: float = 0  # 首重（g）
+    first_weight_fee: float = 0  # 首重费用（元）
+    additional_weight: float = 0  # 续重（g）
+    additional_weight_price: float = 0  # 续重单价（元）
+    registration_fee: float = 0  # 挂号费(RMB/票)
+    actual_weight: float = 0  # 计费重量(g)
+
+@dataclass(slots=True)
 class IossRule:
     """IOSS税率规则数据模型"""
     country: str
     vat_rate: float  # VAT税率
     service_rate: float  # 服务费率
+    country_key: str = field(init=False, repr=False, compare=False)  # 国家(小写，用于匹配)
+
+    def __post_init__(self):
+        # 驻留匹配键，字典查找时可直接按对象identity比较
+        self.country_key = sys.intern(self.country.lower())
 
-@dataclass
+@dataclass(slots=True)
 class Order:
     """订单数据模型，用于存储导入的订单Excel信息"""
     order_number: str
@@ -59,7 +127,7 @@ class Order:
     total_weight: float
     uniform_cost_price: float = 0.0
 
-@dataclass
+@dataclass(slots=True)
 class ShippingOrder:
     """运费订单数据模型"""
     order_number: str
@@ -69,7 +137,7 @@ class ShippingOrder:
     total_weight: float  # 货物总重量(g)
     actual_shipping_fee: float  # 实际运费
 
-@dataclass
+@dataclass(slots=True)
 class Invoice:
     """发票数据模型，用于展示最终发票信息"""
     country: str
@@ -80,7 +148,7 @@ class Invoice:
     redelivery_cost: float = 0.0
     total_charges: float = 0.0
 
-@dataclass
+@dataclass(slots=True)
 class CalculationResult:
     """计算结果数据模型"""
     products: list[Product]
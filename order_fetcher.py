@@ -1,71 +1,119 @@
 import pandas as pd
 import logging
 from models import Order, ShippingOrder
-from typing import List, Dict
+from typing import List, Dict, Iterable
 from config import AppConfig
+from excel_reader import read_excel
 
 # 配置日志
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 按字符串读取的列(跳过类型推断，并避免编号类数据被读成数字，如SKU"001"变成1)
+# 数量、重量、价格等数值列仍交由pandas推断，单元格无效时逐行跳过而不是整个文件读取失败
+_ORDER_TEXT_COLUMN_KEYS = ('order_number', 'order_status', 'order_note', 'country_code', 'country',
+                           'product_name', 'shop_name', 'sku', 'combination_sku')
+_SHIPPING_TEXT_COLUMN_KEYS = ('order_number', 'shipping_channel', 'tracking_number', 'country')
+# Order中文本字段的顺序(与Order定义一致)
+_ORDER_TEXT_FIELD_KEYS = ('order_number', 'order_status', 'order_note', 'payment_time', 'country_code', 'country',
+                          'product_name', 'shop_name', 'sku', 'combination_sku')
+
+def _column_values(df: pd.DataFrame, column: str, default, as_text: bool = False) -> list:
+    """取出整列的值，列不存在时返回默认值列表；as_text为True时整列转换为字符串"""
+    if column not in df.columns:
+        return [str(default) if as_text else default] * len(df)
+    values = df[column]
+    if as_text:
+        values = values.astype(str)
+    return values.tolist()
+
+def read_excel_columns(file_path: str, columns: Iterable[str], text_columns: Iterable[str] = ()) -> pd.DataFrame:
+    """只读取需要的列，并将文本列(如交易编号)按字符串读取，避免类型推断
+
+    Args:
+        file_path: Excel文件路径
+        columns: 需要读取的列名
+        text_columns: 需要按字符串读取的列名
+
+    Returns:
+        DataFrame
+    """
+    wanted = set(columns)
+    return read_excel(file_path, usecols=lambda col: col in wanted, dtype={col: str for col in text_columns})
+
 class OrderFetcher:
     """订单数据获取器"""
     def __init__(self, config: AppConfig):
         self.config = config
 
+    def text_columns(self) -> List[str]:
+        """订单Excel中按字符串读取的列名"""
+        columns = self.config.order_excel_columns
+        return [columns[key] for key in _ORDER_TEXT_COLUMN_KEYS]
+
+    def read_excel(self, file_path: str) -> pd.DataFrame:
+        """读取订单Excel中配置的列"""
+        return read_excel_columns(file_path, self.config.order_excel_columns.values(), self.text_columns())
+
     def load_orders_from_excel(self, file_path: str) -> List[Order]:
         """从Excel文件加载订单数据并转换为Order对象列表"""
         try:
-            logger.info(f"开始从Excel文件加载订单数据: {file_path}")
-            df = pd.read_excel(file_path)
-
-            # 验证必要列是否存在
-            required_columns = [
-                self.config.order_excel_columns['order_number'],
-                self.config.order_excel_columns['order_status'],
-                self.config.order_excel_columns['sku'],
-                self.config.order_excel_columns['quantity']
-            ]
-            if not all(col in df.columns for col in required_columns):
-                missing_cols = [col for col in required_columns if col not in df.columns]
-                raise ValueError(f"Excel文件缺少必要列: {missing_cols}")
-
-            # 转换为Order对象列表
-            orders = []
-            for _, row in df.iterrows():
-                try:
-                    order = Order(
-                        order_number=str(row[self.config.order_excel_columns['order_number']]),
-                        order_status=str(row[self.config.order_excel_columns['order_status']]),
-                        order_note=str(row.get(self.config.order_excel_columns['order_note'], '')),
-                        payment_time=str(row.get(self.config.order_excel_columns['payment_time'], '')),
-                        country_code=str(row.get(self.config.order_excel_columns['country_code'], '')),
-                        country=str(row.get(self.config.order_excel_columns['country'], '')),
-                        product_name=str(row.get(self.config.order_excel_columns['product_name'], '')),
-                        shop_name=str(row.get(self.config.order_excel_columns['shop_name'], '')),
-                        sku=str(row[self.config.order_excel_columns['sku']]),
-                        combination_sku=str(row.get(self.config.order_excel_columns['combination_sku'], '')),
-                        quantity=int(row[self.config.order_excel_columns['quantity']]),
-                        total_weight=float(row.get(self.config.order_excel_columns['total_weight'], 0.0)),
-                        uniform_cost_price=float(row.get(self.config.order_excel_columns['uniform_cost_price'], 0.0))
-                    )
-                    orders.append(order)
-                except (ValueError, TypeError) as e:
-                    logger.warning(f"行数据无效，已跳过: {row}. 错误: {str(e)}")
-
-            logger.info(f"成功加载{len(orders)}条订单数据")
-            return orders
+            logger.info("开始从Excel文件加载订单数据: %s", file_path)
+            return self.load_orders_from_dataframe(self.read_excel(file_path))
         except FileNotFoundError:
-            logger.error(f"Excel文件未找到: {file_path}")
+            logger.error("Excel文件未找到: %s", file_path)
             raise
         except Exception as e:
-            logger.error(f"加载Excel订单数据失败: {str(e)}", exc_info=True)
+            logger.error("加载Excel订单数据失败: %s", e, exc_info=True)
             raise
 
+    def load_orders_from_dataframe(self, df: pd.DataFrame) -> List[Order]:
+        """将已读取的订单DataFrame转换为Order对象列表"""
+        # 列名只取一次，后续直接使用局部变量
+        columns = self.config.order_excel_columns
+
+        # 验证必要列是否存在
+        required_columns = [
+            columns['order_number'],
+            columns['order_status'],
+            columns['sku'],
+            columns['quantity']
+        ]
+        missing_cols = [col for col in required_columns if col not in df.columns]
+        if missing_cols:
+            raise ValueError(f"Excel文件缺少必要列: {missing_cols}")
+
+        # 按列批量取值(文本列整列转换为字符串)，再逐行组装Order，避免iterrows为每行构建Series
+        text_values = [_column_values(df, columns[key], '', as_text=True) for key in _ORDER_TEXT_FIELD_KEYS]
+        quantities = _column_values(df, columns['quantity'], 0)
+        total_weights = _column_values(df, columns['total_weight'], 0.0)
+        uniform_cost_prices = _column_values(df, columns['uniform_cost_price'], 0.0)
+
+        # 转换为Order对象列表
+        orders = []
+        add_order = orders.append
+        # 文本字段按行打包为元组后按位置传参，避免关键字参数解析和星号解包生成列表
+        for texts, quantity, total_weight, uniform_cost_price in zip(zip(*text_values), quantities, total_weights, uniform_cost_prices):
+            try:
+                add_order(Order(*texts, int(quantity), float(total_weight), float(uniform_cost_price)))
+            except (ValueError, TypeError) as e:
+                logger.warning("行数据无效，已跳过: %s. 错误: %s", (*texts, quantity, total_weight, uniform_cost_price), e)
+
+        logger.info("成功加载%s条订单数据", len(orders))
+        return orders
+
 class ShippingOrderFetcher:
     def __init__(self, config: AppConfig):
         self.config = config
 
+    def text_columns(self) -> List[str]:
+        """运费Excel中按字符串读取的列名"""
+        columns = self.config.shipping_excel_columns
+        return [columns[key] for key in _SHIPPING_TEXT_COLUMN_KEYS]
+
+    def read_excel(self, file_path: str) -> pd.DataFrame:
+        """读取运费Excel中配置的列"""
+        return read_excel_columns(file_path, self.config.shipping_excel_columns.values(), self.text_columns())
+
     def load_shipping_orders_from_excel(self, file_path: str) -> List[ShippingOrder]:
         """从Excel文件加载运费订单数据并进行验证
 
@@ -78,68 +126,83 @@ class ShippingOrderFetcher:
         Raises:
             ValueError: 当Excel文件缺少必要列或数据格式错误时
         """
-        logger.info(f"开始从Excel文件加载运费数据: {file_path}")
-        shipping_orders = []
+        logger.info("开始从Excel文件加载运费数据: %s", file_path)
         
         try:
             # 读取Excel文件
-            df = pd.read_excel(file_path)
-            logger.debug(f"成功读取Excel文件，共{len(df)}行数据")
-        
-            # 验证必要列是否存在
-            required_columns = [
-                self.config.shipping_excel_columns['order_number'],
-                self.config.shipping_excel_columns['actual_shipping_fee']
-            ]
-            missing_cols = [col for col in required_columns if col not in df.columns]
-            if missing_cols:
-                raise ValueError(f"运费Excel文件缺少必要列: {missing_cols}")
-        
-            # 处理每一行数据
-            for idx, row in df.iterrows():
-                row_num = idx + 2  # Excel行号从2开始(标题行+数据行索引)
-                try:
-                    # 基本验证
-                    order_number = row.get(self.config.shipping_excel_columns['order_number'])
-                    if pd.isna(order_number) or str(order_number).strip() == '':
-                        logger.warning(f"行{row_num}: 订单编号为空，跳过该行数据")
-                        continue
-        
-                    # 转换并验证运费金额
-                    actual_shipping_fee = row.get(self.config.shipping_excel_columns['actual_shipping_fee'])
-                    if pd.isna(actual_shipping_fee):
-                        logger.warning(f"行{row_num}: 订单编号{order_number}的运费金额为空，跳过该行数据")
-                        continue
-        
-                    try:
-                        actual_shipping_fee = float(actual_shipping_fee)
-                        if actual_shipping_fee < 0:
-                            raise ValueError("运费金额不能为负数")
-                    except (ValueError, TypeError) as e:
-                        logger.warning(f"行{row_num}: 订单编号{order_number}的运费金额无效({actual_shipping_fee})，错误: {str(e)}")
-                        continue
-        
-                    # 创建ShippingOrder对象
-                    shipping_order = ShippingOrder(
-                        order_number=str(order_number).strip(),
-                        shipping_channel=str(row.get(self.config.shipping_excel_columns['shipping_channel'], '')).strip(),
-                        tracking_number=str(row.get(self.config.shipping_excel_columns['tracking_number'], '')).strip(),
-                        country=str(row.get(self.config.shipping_excel_columns['country'], '')).strip(),
-                        total_weight=float(row.get(self.config.shipping_excel_columns['total_weight'], 0.0)),
-                        actual_shipping_fee=actual_shipping_fee
-                    )
-                    shipping_orders.append(shipping_order)
-        
-                except Exception as e:
-                    logger.error(f"行{row_num}: 处理订单数据时发生错误，跳过该行: {str(e)}")
-                    continue
-        
-            logger.info(f"成功加载并验证{len(shipping_orders)}条运费数据，共跳过{len(df)-len(shipping_orders)}行无效数据")
-            return shipping_orders
+            df = self.read_excel(file_path)
+            logger.debug("成功读取Excel文件，共%s行数据", len(df))
+            return self.load_shipping_orders_from_dataframe(df)
         
         except FileNotFoundError:
-            logger.error(f"运费Excel文件未找到: {file_path}")
+            logger.error("运费Excel文件未找到: %s", file_path)
             raise
         except Exception as e:
-            logger.error(f"加载运费Excel文件失败: {str(e)}", exc_info=True)
-            raise
\ No newline at end of file
+            logger.error("加载运费Excel文件失败: %s", e, exc_info=True)
+            raise
+
+    def load_shipping_orders_from_dataframe(self, df: pd.DataFrame) -> List[ShippingOrder]:
+        """将已读取的运费DataFrame转换为ShippingOrder对象列表并进行验证"""
+        shipping_orders = []
+
+        # 列名只取一次，后续直接使用局部变量
+        columns = self.config.shipping_excel_columns
+
+        # 验证必要列是否存在
+        required_columns = [
+            columns['order_number'],
+            columns['actual_shipping_fee']
+        ]
+        missing_cols = [col for col in required_columns if col not in df.columns]
+        if missing_cols:
+            raise ValueError(f"运费Excel文件缺少必要列: {missing_cols}")
+        
+        # 整列向量化校验：订单编号非空、运费金额非空且为非负数字
+        order_numbers = df[columns['order_number']]
+        order_number_text = order_numbers.astype(str).str.strip()
+        raw_fees = df[columns['actual_shipping_fee']]
+        fees = pd.to_numeric(raw_fees, errors='coerce')
+        missing_order = order_numbers.isna() | order_number_text.eq('')
+        missing_fee = ~missing_order & raw_fees.isna()
+        # pandas无法直接转换的运费值(如带空格的文本)逐个回退到float()转换
+        unparsed = ~missing_order & ~missing_fee & fees.isna()
+        for idx in unparsed[unparsed].index:
+            try:
+                fees[idx] = float(raw_fees[idx])
+            except (ValueError, TypeError):
+                pass
+        invalid_fee = ~missing_order & ~missing_fee & (fees.isna() | fees.lt(0))
+        valid = ~(missing_order | missing_fee | invalid_fee)
+
+        # 只对无效行逐行记录原因(Excel行号从2开始：标题行+数据行索引)
+        for idx in valid[~valid].index:
+            row_num = idx + 2
+            if missing_order[idx]:
+                logger.warning("行%s: 订单编号为空，跳过该行数据", row_num)
+            elif missing_fee[idx]:
+                logger.warning("行%s: 订单编号%s的运费金额为空，跳过该行数据", row_num, order_numbers[idx])
+            else:
+                reason = "运费金额不能为负数" if fees[idx] < 0 else "运费金额不是有效数字"
+                logger.warning("行%s: 订单编号%s的运费金额无效(%s)，错误: %s", row_num, order_numbers[idx], raw_fees[idx], reason)
+
+        # 有效行按列批量取值(文本列整列转换为字符串并去除首尾空白)
+        valid_df = df[valid]
+        shipping_channels, tracking_numbers, countries = (
+            valid_df[columns[key]].astype(str).str.strip().tolist() if columns[key] in df.columns else [''] * len(valid_df)
+            for key in ('shipping_channel', 'tracking_number', 'country')
+        )
+        total_weights = _column_values(valid_df, columns['total_weight'], 0.0)
+        rows = zip(valid_df.index.tolist(), order_number_text[valid].tolist(), fees[valid].tolist(),
+                   shipping_channels, tracking_numbers, countries, total_weights)
+
+        # 按ShippingOrder字段顺序位置传参
+        add_shipping_order = shipping_orders.append
+        for idx, order_number, actual_shipping_fee, shipping_channel, tracking_number, country, total_weight in rows:
+            try:
+                add_shipping_order(ShippingOrder(order_number, shipping_channel, tracking_number, country,
+                                                 float(total_weight), actual_shipping_fee))
+            except (ValueError, TypeError) as e:
+                logger.error("行%s: 处理订单数据时发生错误，跳过该行: %s", idx + 2, e)
+        
+        logger.info("成功加载并验证%s条运费数据，共跳过%s行无效数据", len(shipping_orders), len(df) - len(shipping_orders))
+        return shipping_orders
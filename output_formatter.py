@@ -1,5 +1,92 @@
+import sys
 from typing import List
-from models import Product, CalculationResult, Invoice, Order
+from itertools import chain, repeat
+import numpy as np
+from models import Product, ProductBatch, CalculationResult, Invoice, Order, ShippingRuleInfo
+
+# HTML中固定不变的片段(模块加载时拼接一次)
+_SECTION_OPEN = "<div style='margin-bottom: 20px; padding: 10px; border: 1px solid #ddd; border-radius: 5px;'>"
+_TABLE_OPEN = "<table border='1' cellspacing='0' cellpadding='5' style='border-collapse: collapse;'>"
+_FULL_WIDTH_TABLE_OPEN = "<table border='1' cellspacing='0' cellpadding='5' style='border-collapse: collapse; width: 100%;'>"
+_TABLE_SECTION_CLOSE = "</table></div>"
+# 关闭表格、所在区块及最外层容器
+_TABLE_PAGE_CLOSE = _TABLE_SECTION_CLOSE + "</div>"
+_RESULT_HTML_HEAD = "<div style='font-family: Arial, sans-serif;'><h2>查询结果</h2>"
+_PRODUCT_SECTION_HEAD = (_SECTION_OPEN + "<h3>产品价格信息</h3>" + _TABLE_OPEN +
+                         "<tr><th>产品名称</th><th>单价</th><th>数量</th><th>产品价格</th><th>实际重量(g)</th><th>体积重量(g)</th></tr>")
+_IOSS_SECTION_HEAD = (_SECTION_OPEN + "<h3>IOSS税金信息</h3>" + _TABLE_OPEN +
+                      "<tr><th>总IOSS价格</th><th>适用VAT税率</th><th>适用服务费率</th><th>总IOSS税金</th></tr>")
+_NO_IOSS_ROW = "<tr><td colspan='4'>没有适用的IOSS税金信息</td></tr>"
+_SHIPPING_SECTION_HEAD = (_SECTION_OPEN + "<h3>运费价格信息</h3>" + _TABLE_OPEN +
+                          "<tr><th>货代公司</th><th>目的地</th><th>区域</th><th>参考时效</th><th>重量(g)</th><th>首重(g/元)</th>"
+                          "<th>续重(g/元)</th><th>手续费(元/票)</th><th>运费价格</th></tr>")
+_NO_SHIPPING_ROW = "<tr><td colspan='7'>没有适用的运费规则信息</td></tr>"
+_TOTALS_SECTION_HEAD = "<div style='margin-top: 20px; padding: 10px; border: 2px solid #4CAF50; border-radius: 5px;'><h3>总价格</h3>"
+_INVOICES_HTML_HEAD = ("<div style='font-family: Arial, sans-serif;'><h2>发票信息</h2>" + _SECTION_OPEN + _FULL_WIDTH_TABLE_OPEN +
+                       "<tr><th>国家</th><th>订单编号</th><th>产品成本 (RMB)</th><th>产品成本 (USD)</th><th>运费 (RMB)</th>"
+                       "<th>运费 (USD)</th><th>IOSS成本 (RMB)</th><th>IOSS成本 (USD)</th><th>重发成本 (RMB)</th>"
+                       "<th>总费用 (RMB)</th><th>总费用 (USD)</th></tr>")
+_INVOICE_ITEMS_SECTION_HEAD = (_SECTION_OPEN + "<h3>订单项目明细</h3>" + _FULL_WIDTH_TABLE_OPEN +
+                               "<tr><th>产品名称</th><th>SKU</th><th>组合SKU</th><th>数量</th><th>统一成本价</th></tr>")
+
+# 查询结果HTML的行模板(模块加载时构建一次，按位置填充)
+# 产品行: 产品名称, 单价, 数量, 产品价格(RMB), 产品价格(USD), 实际重量, 体积重量
+_PRODUCT_ROW_HTML = "<tr><td>{}</td><td>{:.2f}</td><td>{}</td><td>{:.2f} RMB ({:.2f} USD)</td><td>{:.2f}</td><td>{:.2f}</td></tr>".format
+# 未找到价格的产品行: 产品名称, 数量
+_PRODUCT_ROW_NO_PRICE_HTML = "<tr><td>{}</td><td>-</td><td>{}</td><td>-</td><td>-</td><td>-</td></tr>".format
+# IOSS行: 总IOSS价格, VAT税率(%), 服务费率(%), 总IOSS税金(RMB), 总IOSS税金(USD)
+_IOSS_ROW_HTML = "<tr><td>{:.2f} RMB</td><td>{:.1f}%</td><td>{:.1f}%</td><td>{:.2f} RMB ({:.2f} USD)</td></tr>".format
+# 运费行: 货代公司, 目的地, 区域, 参考时效, 重量, 首重, 首重费用, 续重, 续重单价, 手续费, 运费(RMB), 运费(USD)
+_SHIPPING_ROW_HTML = ("<tr><td>{}</td><td>{}</td><td>{}</td><td>{}</td><td>{:.0f}</td><td>{}/{:.3f}</td><td>{}/{:.3f}</td>"
+                      "<td>{:.2f}</td><td>{:.2f} RMB ({:.2f} USD)</td></tr>").format
+# 总价格: 产品总价格、IOSS税金总价格、运费总价格、累计总价格(各自RMB与USD)
+_TOTALS_HTML = ("<p>产品总价格: {:.2f} RMB ({:.2f} USD)</p>"
+                "<p>IOSS税金总价格: {:.2f} RMB ({:.2f} USD)</p>"
+                "<p>运费总价格: {:.2f} RMB ({:.2f} USD)</p>"
+                "<p>累计总价格: {:.2f} RMB ({:.2f} USD)</p>").format
+
+# 命令行结果中固定不变的标题和表头
+_REPORT_HEAD_TEXT = "\n\n==================== 查询结果 ===================="
+_PRODUCT_TABLE_HEAD_TEXT = "\n".join([
+    "\n------------- 产品价格信息 -------------",
+    f"{'产品名称':<15} {'单价':<10} {'数量':<10} {'产品价格':<10}",
+    "-----------------------------------------",
+])
+_SHIPPING_TABLE_HEAD_TEXT = "\n".join([
+    "\n\n------------- 运费价格信息 -------------",
+    f"{'产品名称':<15} {'货代公司':<15} {'目的地':<10} {'区域':<10} {'参考时效':<10} {'重量(g)':<10} {'首重':<15} {'续重':<15} {'手续费':<10} {'运费':<10}",
+    "-" * 151,
+])
+
+# 命令行结果的行模板(按位置填充，对齐宽度与表头一致)
+# 产品价格行: 产品名称, 单价, 数量, 产品价格
+_PRODUCT_ROW_TEXT = "{:<15} {:<10.2f} {:<10} {:<10.2f}".format
+_PRODUCT_ROW_NO_PRICE_TEXT = ("{:<15} " + " ".join(['-'.ljust(10)] * 3)).format
+# 运费行: 产品名称, 货代公司, 目的地, 区域, 参考时效, 重量, 首重, 首重费用, 续重, 续重单价, 手续费, 运费
+_SHIPPING_ROW_TEXT = ("{:<15} {:<15} {:<10} {:<10} {:<10} {:<10.0f} {}g/{:.3f}元      {}g/{:.3f}元      "
+                      "{:<10.2f} {:<10.2f}").format
+_SHIPPING_ROW_NO_PRICE_TEXT = ("{:<15} " + '-'.ljust(15) + " " + " ".join(['-'.ljust(10)] * 6)).format
+# IOSS规则行: VAT税率(%), 服务费率(%)
+_IOSS_RULE_TEXT = ("适用税率规则:".ljust(35) + " VAT税率 {:.1f}%, 服务费率 {:.1f}%").format
+_IOSS_PRICE_TEXT = ("总IOSS价格:".ljust(35) + " {:.2f} RMB").format
+# 金额行: 名称, 金额(RMB), 金额(USD)
+_AMOUNT_TEXT = "{:<35} {:.2f} RMB ({:.2f} USD)".format
+
+_PRODUCT_IMAGES_OPEN = "<div style='display: flex; flex-wrap: wrap; gap: 20px;'>"
+
+def _render_image_card(product: Product) -> str:
+    """生成单个产品的图片卡片HTML"""
+    image_url = getattr(product, 'image_url', None)
+    if image_url:
+        image = f"<img src='{image_url}' alt='{product.sku}' style='max-width: 200px; max-height: 200px;'>"
+    else:
+        image = "<p>没有找到产品图片</p>"
+    return f"<div style='text-align: center;'><h3>{product.sku}</h3>{image}<p>数量: {product.quantity}</p></div>"
+
+def _ioss_rule_values(ioss_info: dict) -> tuple:
+    """从IOSS信息中一次性取出展示用的VAT税率(%)、服务费率(%)和总IOSS价格"""
+    get = ioss_info.get
+    return get('vat_rate', 0) * 100, get('service_rate', 0) * 100, get('total_ioss_price', 0)
 
 class OutputFormatter:
     """输出格式化器"""
@@ -12,248 +99,213 @@ class OutputFormatter:
     @staticmethod
     def print_results(result: CalculationResult, destination: str, product_rule_infos: list = None, product_ioss_infos: list = None, exchange_rate: float = 6.9) -> None:
         """打印计算结果(命令行)"""
-        print("\n\n==================== 查询结果 ====================")
+        # 汇率倒数只计算一次，USD金额统一用乘法换算
+        inv_rate = 1.0 / exchange_rate
+        # 所有行先收集到列表，最后一次性写入标准输出
+        lines = [_REPORT_HEAD_TEXT]
+        add = lines.append
         
-        total_product_price = 0.0
-        total_shipping_fee = 0.0
+        # 产品总价和运费合计按数组一次性求和，循环中只负责输出
+        products = result.products
+        batch = ProductBatch.from_products(products)
+        priced = batch.price > 0
+        product_totals = np.where(priced, batch.price * batch.quantity, 0.0)
+        total_product_price = float(product_totals.sum())
+        shipping_fees = np.fromiter((product.shipping_fee for product in products), dtype=np.float64, count=len(products))
+        total_shipping_fee = float(shipping_fees[priced].sum())
         
         # 打印所有产品价格信息
-        print("\n------------- 产品价格信息 -------------")
-        print(f"{'产品名称':<15} {'单价':<10} {'数量':<10} {'产品价格':<10}")
-        print("-----------------------------------------")
-        for i, product in enumerate(result.products):
+        add(_PRODUCT_TABLE_HEAD_TEXT)
+        for product, product_total in zip(products, product_totals.tolist()):
             if product.price > 0:
-                product_total = product.price * product.quantity
-                total_product_price += product_total
-                print(f"{product.sku:<15} {product.price:<10.2f} {product.quantity:<10} {product_total:<10.2f}")
+                add(_PRODUCT_ROW_TEXT(product.sku, product.price, product.quantity, product_total))
             else:
-                print(f"{product.sku:<15} {'-':<10} {'-':<10} {'-':<10}")
-                print(f"产品 '{product.sku}' 未找到价格信息")
+                add(_PRODUCT_ROW_NO_PRICE_TEXT(product.sku))
+                add(f"产品 '{product.sku}' 未找到价格信息")
         
         # 打印所有运费价格信息
-        print("\n\n------------- 运费价格信息 -------------")
-        print(f"{'产品名称':<15} {'货代公司':<15} {'目的地':<10} {'区域':<10} {'参考时效':<10} {'重量(g)':<10} {'首重':<15} {'续重':<15} {'手续费':<10} {'运费':<10}")
-        print("-------------------------------------------------------------------------------------------------------------------------------------------------------")
-        for i, product in enumerate(result.products):
+        add(_SHIPPING_TABLE_HEAD_TEXT)
+        # 规则信息与产品一一对应，不足的部分使用空的规则信息
+        rule_infos = chain(product_rule_infos or (), repeat(ShippingRuleInfo()))
+        for product, rule_info in zip(products, rule_infos):
             if product.price > 0:
-                rule_info = product_rule_infos[i] if (product_rule_infos and i < len(product_rule_infos)) else {}
-                shipping_company = rule_info.get('shipping_company', '')
-                region = rule_info.get('region', '')
-                min_days = rule_info.get('min_delivery_days', 0)
-                max_days = rule_info.get('max_delivery_days', 0)
-                estimated_delivery_time = f"{min_days}-{max_days}天" if min_days > 0 and max_days > 0 else ""
-                actual_weight = rule_info.get('actual_weight', 0)
-                first_weight = rule_info.get('first_weight', 0)
-                first_weight_fee = rule_info.get('first_weight_fee', 0)
-                additional_weight = rule_info.get('additional_weight', 0)
-                additional_weight_price = rule_info.get('additional_weight_price', 0)
-                registration_fee = rule_info.get('registration_fee', 0)
+                shipping_company = rule_info.shipping_company
+                region = rule_info.region
+                estimated_delivery_time = rule_info.estimated_delivery_time
+                actual_weight = rule_info.actual_weight
+                first_weight = rule_info.first_weight
+                first_weight_fee = rule_info.first_weight_fee
+                additional_weight = rule_info.additional_weight
+                additional_weight_price = rule_info.additional_weight_price
+                registration_fee = rule_info.registration_fee
                 
-                total_shipping_fee += product.shipping_fee
-                print(f"{product.sku:<15} {shipping_company:<15} {destination:<10} {region:<10} {estimated_delivery_time:<10} {actual_weight:<10.0f} {first_weight}g/{first_weight_fee:.3f}元{'':<5} {additional_weight}g/{additional_weight_price:.3f}元{'':<5} {registration_fee:<10.2f} {product.shipping_fee:<10.2f}")
+                add(_SHIPPING_ROW_TEXT(product.sku, shipping_company, destination, region, estimated_delivery_time, actual_weight,
+                                         first_weight, first_weight_fee, additional_weight, additional_weight_price,
+                                         registration_fee, product.shipping_fee))
             else:
-                print(f"{product.sku:<15} {'-':<15} {'-':<10} {'-':<10} {'-':<10} {'-':<10} {'-':<10} {'-':<10}")
+                add(_SHIPPING_ROW_NO_PRICE_TEXT(product.sku))
         
         # 打印IOSS税金信息
-        print("\n\n------------- IOSS税金信息 -------------")
+        add("\n\n------------- IOSS税金信息 -------------")
         total_ioss_tax = result.ioss_taxes
-        ioss_tax_usd = total_ioss_tax / exchange_rate
+        ioss_tax_usd = total_ioss_tax * inv_rate
         
         # 显示IOSS税率规则信息
-        if total_ioss_tax > 0 and product_ioss_infos and len(product_ioss_infos) > 0:
+        if total_ioss_tax > 0 and product_ioss_infos:
             # 取第一个产品的IOSS信息作为规则参考
             ioss_info = product_ioss_infos[0]
             if ioss_info:
-                vat_rate = ioss_info.get('vat_rate', 0) * 100
-                service_rate = ioss_info.get('service_rate', 0) * 100
-                total_ioss_price = ioss_info.get('total_ioss_price', 0)
-                print(f"{'适用税率规则:':<35} VAT税率 {vat_rate:.1f}%, 服务费率 {service_rate:.1f}%")
-                print(f"{'总IOSS价格:':<35} {total_ioss_price:.2f} RMB")
-        print(f"{'总IOSS税金:':<35} {total_ioss_tax:.2f} RMB ({ioss_tax_usd:.2f} USD)")
+                vat_rate, service_rate, total_ioss_price = _ioss_rule_values(ioss_info)
+                add(_IOSS_RULE_TEXT(vat_rate, service_rate))
+                add(_IOSS_PRICE_TEXT(total_ioss_price))
+        add(_AMOUNT_TEXT('总IOSS税金:', total_ioss_tax, ioss_tax_usd))
         
         # 打印总价格部分 #
-        print("\n\n------------- 总价格 -------------")
-        product_total_usd = total_product_price / exchange_rate
-        shipping_total_usd = total_shipping_fee / exchange_rate
-        ioss_tax_usd = total_ioss_tax / exchange_rate
-        total_amount_usd = result.total_amount / exchange_rate
-        print(f"{'产品总价格:':<35} {total_product_price:.2f} RMB ({product_total_usd:.2f} USD)")
-        print(f"{'IOSS税金总价格:':<35} {total_ioss_tax:.2f} RMB ({ioss_tax_usd:.2f} USD)")
-        print(f"{'运费总价格:':<35} {total_shipping_fee:.2f} RMB ({shipping_total_usd:.2f} USD)")
-        print(f"{'累计总价格:':<35} {result.total_amount:.2f} RMB ({total_amount_usd:.2f} USD)")
-        print("=================================================================================================")
+        add("\n\n------------- 总价格 -------------")
+        product_total_usd = total_product_price * inv_rate
+        shipping_total_usd = total_shipping_fee * inv_rate
+        total_amount_usd = result.total_amount * inv_rate
+        add(_AMOUNT_TEXT('产品总价格:', total_product_price, product_total_usd))
+        add(_AMOUNT_TEXT('IOSS税金总价格:', total_ioss_tax, ioss_tax_usd))
+        add(_AMOUNT_TEXT('运费总价格:', total_shipping_fee, shipping_total_usd))
+        add(_AMOUNT_TEXT('累计总价格:', result.total_amount, total_amount_usd))
+        add("=================================================================================================")
+        sys.stdout.write("\n".join(lines) + "\n")
     
     @staticmethod
     def format_results_as_html(result: CalculationResult, destination: str, product_rule_infos: list = None, product_ioss_infos: list = None, exchange_rate: float = 6.9) -> str:
         """生成HTML格式的查询结果"""
-        html_result = "<div style='font-family: Arial, sans-serif;'>"
-        html_result += "<h2>查询结果</h2>"
+        # 汇率倒数只计算一次，USD金额统一用乘法换算
+        inv_rate = 1.0 / exchange_rate
+        parts = [_RESULT_HTML_HEAD]
 
-        total_product_price = 0.0
+        # 产品总价按数组一次性求和(与Calculator.calculate_totals的求和方式一致)，循环中只负责渲染
+        products = result.products
+        batch = ProductBatch.from_products(products)
+        product_totals = np.where(batch.price > 0, batch.price * batch.quantity, 0.0)
+        total_product_price = float(product_totals.sum())
         total_shipping_fee = 0.0
 
         # 产品价格信息部分
-        html_result += "<div style='margin-bottom: 20px; padding: 10px; border: 1px solid #ddd; border-radius: 5px;'>"
-        html_result += "<h3>产品价格信息</h3>"
-        html_result += "<table border='1' cellspacing='0' cellpadding='5' style='border-collapse: collapse;'>"
-        html_result += "<tr><th>产品名称</th><th>单价</th><th>数量</th><th>产品价格</th><th>实际重量(g)</th><th>体积重量(g)</th></tr>"
+        parts.append(_PRODUCT_SECTION_HEAD)
 
-        for i, p in enumerate(result.products):
+        for p, product_total in zip(products, product_totals.tolist()):
             if p.price > 0:
-                product_total = p.price * p.quantity
-                total_product_price += product_total
-                product_total_usd = product_total / exchange_rate
+                product_total_usd = product_total * inv_rate
                 # 获取产品的实际重量和体积重量
                 actual_weight = getattr(p, 'actual_weight', 0)
                 volume_weight = getattr(p, 'volume_weight', 0)
-                html_result += f"<tr><td>{p.sku}</td><td>{p.price:.2f}</td><td>{p.quantity}</td><td>{product_total:.2f} RMB ({product_total_usd:.2f} USD)</td><td>{actual_weight:.2f}</td><td>{volume_weight:.2f}</td></tr>"
+                parts.append(_PRODUCT_ROW_HTML(p.sku, p.price, p.quantity, product_total, product_total_usd, actual_weight, volume_weight))
             else:
-                html_result += f"<tr><td>{p.sku}</td><td>-</td><td>{p.quantity}</td><td>-</td><td>-</td><td>-</td></tr>"
+                parts.append(_PRODUCT_ROW_NO_PRICE_HTML(p.sku, p.quantity))
 
-        html_result += "</table>"
-        html_result += "</div>"
+        parts.append(_TABLE_SECTION_CLOSE)
 
         # IOSS税金信息部分
         total_ioss_tax = result.ioss_taxes
-        html_result += "<div style='margin-bottom: 20px; padding: 10px; border: 1px solid #ddd; border-radius: 5px;'>"
-        html_result += "<h3>IOSS税金信息</h3>"
-        html_result += "<table border='1' cellspacing='0' cellpadding='5' style='border-collapse: collapse;'>"
-        html_result += "<tr><th>总IOSS价格</th><th>适用VAT税率</th><th>适用服务费率</th><th>总IOSS税金</th></tr>"
+        parts.append(_IOSS_SECTION_HEAD)
 
-        if total_ioss_tax > 0 and product_ioss_infos and len(product_ioss_infos) > 0:
+        if total_ioss_tax > 0 and product_ioss_infos:
             # 取第一个产品的IOSS信息作为规则参考
             ioss_info = product_ioss_infos[0]
             if ioss_info:
-                vat_rate = ioss_info.get('vat_rate', 0) * 100
-                service_rate = ioss_info.get('service_rate', 0) * 100
-                total_ioss_price = ioss_info.get('total_ioss_price', 0)
-                ioss_tax_usd = total_ioss_tax / exchange_rate
-                html_result += f"<tr><td>{total_ioss_price:.2f} RMB</td><td>{vat_rate:.1f}%</td><td>{service_rate:.1f}%</td><td>{total_ioss_tax:.2f} RMB ({ioss_tax_usd:.2f} USD)</td></tr>"
+                vat_rate, service_rate, total_ioss_price = _ioss_rule_values(ioss_info)
+                ioss_tax_usd = total_ioss_tax * inv_rate
+                parts.append(_IOSS_ROW_HTML(total_ioss_price, vat_rate, service_rate, total_ioss_tax, ioss_tax_usd))
         else:
-            html_result += "<tr><td colspan='4'>没有适用的IOSS税金信息</td></tr>"
+            parts.append(_NO_IOSS_ROW)
 
-        html_result += "</table>"
-        html_result += "</div>"
+        parts.append(_TABLE_SECTION_CLOSE)
 
         # 运费价格信息部分
-        html_result += "<div style='margin-bottom: 20px; padding: 10px; border: 1px solid #ddd; border-radius: 5px;'>"
-        html_result += "<h3>运费价格信息</h3>"
-        html_result += "<table border='1' cellspacing='0' cellpadding='5' style='border-collapse: collapse;'>"
-        html_result += "<tr><th>货代公司</th><th>目的地</th><th>区域</th><th>参考时效</th><th>重量(g)</th><th>首重(g/元)</th><th>续重(g/元)</th><th>手续费(元/票)</th><th>运费价格</th></tr>"
+        parts.append(_SHIPPING_SECTION_HEAD)
 
         # 显示总运费信息（合并成一条）
         if product_rule_infos and len(product_rule_infos) > 0:
             rule_info = product_rule_infos[0]
-            shipping_company = rule_info.get('shipping_company', '')
-            region = rule_info.get('region', '')
-            min_days = rule_info.get('min_delivery_days', 0)
-            max_days = rule_info.get('max_delivery_days', 0)
-            estimated_delivery_time = f"{min_days}-{max_days}天" if min_days > 0 and max_days > 0 else ""
-            actual_weight = rule_info.get('actual_weight', 0)
-            first_weight = rule_info.get('first_weight', 0)
-            first_weight_fee = rule_info.get('first_weight_fee', 0)
-            additional_weight = rule_info.get('additional_weight', 0)
-            additional_weight_price = rule_info.get('additional_weight_price', 0)
-            registration_fee = rule_info.get('registration_fee', 0)
+            shipping_company = rule_info.shipping_company
+            region = rule_info.region
+            estimated_delivery_time = rule_info.estimated_delivery_time
+            actual_weight = rule_info.actual_weight
+            first_weight = rule_info.first_weight
+            first_weight_fee = rule_info.first_weight_fee
+            additional_weight = rule_info.additional_weight
+            additional_weight_price = rule_info.additional_weight_price
+            registration_fee = rule_info.registration_fee
             # 从result中获取总运费
             total_shipping_fee = result.total_amount - total_product_price - result.ioss_taxes
             shipping_fee = total_shipping_fee
-            shipping_fee_usd = shipping_fee / exchange_rate
-            html_result += f"<tr><td>{shipping_company}</td><td>{destination}</td><td>{region}</td><td>{estimated_delivery_time}</td><td>{actual_weight:.0f}</td><td>{first_weight}/{first_weight_fee:.3f}</td><td>{additional_weight}/{additional_weight_price:.3f}</td><td>{registration_fee:.2f}</td><td>{shipping_fee:.2f} RMB ({shipping_fee_usd:.2f} USD)</td></tr>"
+            shipping_fee_usd = shipping_fee * inv_rate
+            parts.append(_SHIPPING_ROW_HTML(shipping_company, destination, region, estimated_delivery_time, actual_weight,
+                                            first_weight, first_weight_fee, additional_weight, additional_weight_price,
+                                            registration_fee, shipping_fee, shipping_fee_usd))
         else:
-            html_result += "<tr><td colspan='7'>没有适用的运费规则信息</td></tr>"
+            parts.append(_NO_SHIPPING_ROW)
 
-        html_result += "</table>"
-        html_result += "</div>"
+        parts.append(_TABLE_SECTION_CLOSE)
 
         # 总价格部分（移到运费价格信息div外部）
         total_amount = result.total_amount
-        html_result += "<div style='margin-top: 20px; padding: 10px; border: 2px solid #4CAF50; border-radius: 5px;'>"
-        html_result += "<h3>总价格</h3>"
-        product_total_usd = total_product_price / exchange_rate
-        shipping_total_usd = total_shipping_fee / exchange_rate
-        total_ioss_tax = result.ioss_taxes
-        ioss_tax_usd = total_ioss_tax / exchange_rate
-        total_amount_usd = total_amount / exchange_rate
-        html_result += f"<p>产品总价格: {total_product_price:.2f} RMB ({product_total_usd:.2f} USD)</p>"
-        html_result += f"<p>IOSS税金总价格: {total_ioss_tax:.2f} RMB ({ioss_tax_usd:.2f} USD)</p>"
-        html_result += f"<p>运费总价格: {total_shipping_fee:.2f} RMB ({shipping_total_usd:.2f} USD)</p>"
-        html_result += f"<p>累计总价格: {total_amount:.2f} RMB ({total_amount_usd:.2f} USD)</p>"
-        html_result += "</div>"
+        parts.append(_TOTALS_SECTION_HEAD)
+        product_total_usd = total_product_price * inv_rate
+        shipping_total_usd = total_shipping_fee * inv_rate
+        ioss_tax_usd = total_ioss_tax * inv_rate
+        total_amount_usd = total_amount * inv_rate
+        parts.append(_TOTALS_HTML(total_product_price, product_total_usd, total_ioss_tax, ioss_tax_usd,
+                                  total_shipping_fee, shipping_total_usd, total_amount, total_amount_usd))
+        parts.append("</div>")
 
-        return html_result
+        return "".join(parts)
     
     @staticmethod
     def format_product_images(products: List[Product]) -> str:
         """生成产品图片的HTML展示"""
-        html_images = "<div style='display: flex; flex-wrap: wrap; gap: 20px;'>"
-        for product in products:
-            html_images += f"<div style='text-align: center;'>"
-            html_images += f"<h3>{product.sku}</h3>"
-            if hasattr(product, 'image_url') and product.image_url:
-                html_images += f"<img src='{product.image_url}' alt='{product.sku}' style='max-width: 200px; max-height: 200px;'>"
-            else:
-                html_images += f"<p>没有找到产品图片</p>"
-            html_images += f"<p>数量: {product.quantity}</p>"
-            html_images += f"</div>"
-        html_images += "</div>"
-        return html_images
+        return _PRODUCT_IMAGES_OPEN + "".join(map(_render_image_card, products)) + "</div>"
 
     @staticmethod
     def format_invoices_as_html(invoices: List[Invoice], exchange_rate: float = 6.9) -> str:
         """生成发票信息的HTML展示"""
-        html_result = "<div style='font-family: Arial, sans-serif;'>"
-        html_result += "<h2>发票信息</h2>"
-
+        inv_rate = 1.0 / exchange_rate
         # 发票表格
-        html_result += "<div style='margin-bottom: 20px; padding: 10px; border: 1px solid #ddd; border-radius: 5px;'>"
-        html_result += "<table border='1' cellspacing='0' cellpadding='5' style='border-collapse: collapse; width: 100%;'>"
-        html_result += "<tr><th>国家</th><th>订单编号</th><th>产品成本 (RMB)</th><th>产品成本 (USD)</th><th>运费 (RMB)</th><th>运费 (USD)</th><th>IOSS成本 (RMB)</th><th>IOSS成本 (USD)</th><th>重发成本 (RMB)</th><th>总费用 (RMB)</th><th>总费用 (USD)</th></tr>"
+        parts = [_INVOICES_HTML_HEAD]
 
         for invoice in invoices:
-            product_cost_usd = invoice.product_cost / exchange_rate
-            shipping_cost_usd = invoice.shipping_cost / exchange_rate
-            redelivery_cost_usd = invoice.redelivery_cost / exchange_rate
-            total_charges_usd = invoice.total_charges / exchange_rate
+            product_cost_usd = invoice.product_cost * inv_rate
+            shipping_cost_usd = invoice.shipping_cost * inv_rate
+            ioss_cost_usd = invoice.ioss_cost * inv_rate
+            total_charges_usd = invoice.total_charges * inv_rate
 
-            html_result += f"<tr><td>{invoice.country}</td><td>{invoice.order_number}</td><td>{invoice.product_cost:.2f}</td><td>{product_cost_usd:.2f}</td><td>{invoice.shipping_cost:.2f}</td><td>{shipping_cost_usd:.2f}</td><td>{invoice.ioss_cost:.2f}</td><td>{invoice.ioss_cost/exchange_rate:.2f}</td><td>{invoice.redelivery_cost:.2f}</td><td>{invoice.total_charges:.2f}</td><td>{total_charges_usd:.2f}</td></tr>"
+            parts.append(f"<tr><td>{invoice.country}</td><td>{invoice.order_number}</td><td>{invoice.product_cost:.2f}</td><td>{product_cost_usd:.2f}</td><td>{invoice.shipping_cost:.2f}</td><td>{shipping_cost_usd:.2f}</td><td>{invoice.ioss_cost:.2f}</td><td>{ioss_cost_usd:.2f}</td><td>{invoice.redelivery_cost:.2f}</td><td>{invoice.total_charges:.2f}</td><td>{total_charges_usd:.2f}</td></tr>")
 
-        html_result += "</table>"
-        html_result += "</div>"
-        html_result += "</div>"
-        return html_result
+        parts.append(_TABLE_PAGE_CLOSE)
+        return "".join(parts)
 
     @staticmethod
     def format_invoice_details_as_html(invoice: Invoice, orders: List[Order], exchange_rate: float = 6.9) -> str:
         """生成单个发票的详细信息HTML展示"""
-        html_result = "<div style='font-family: Arial, sans-serif;'>"
-        html_result += f"<h2>发票详情 - 订单 {invoice.order_number}</h2>"
+        parts = ["<div style='font-family: Arial, sans-serif;'>"]
+        parts.append(f"<h2>发票详情 - 订单 {invoice.order_number}</h2>")
 
         # 发票基本信息
-        html_result += "<div style='margin-bottom: 20px; padding: 10px; border: 1px solid #ddd; border-radius: 5px;'>"
-        html_result += "<h3>基本信息</h3>"
-        html_result += f"<p>国家: {invoice.country}</p>"
-        html_result += f"<p>订单编号: {invoice.order_number}</p>"
-        html_result += f"<p>产品成本: {invoice.product_cost:.2f} RMB ({invoice.product_cost/exchange_rate:.2f} USD)</p>"
-        html_result += f"<p>运费: {invoice.shipping_cost:.2f} RMB ({invoice.shipping_cost/exchange_rate:.2f} USD)</p>"
-        html_result += f"<p>IOSS成本: {invoice.ioss_cost:.2f} RMB ({invoice.ioss_cost/exchange_rate:.2f} USD)</p>"
-        html_result += f"<p>重发成本: {invoice.redelivery_cost:.2f} RMB ({invoice.redelivery_cost/exchange_rate:.2f} USD)</p>"
-        html_result += f"<p>总费用: {invoice.total_charges:.2f} RMB ({invoice.total_charges/exchange_rate:.2f} USD)</p>"
-        html_result += "</div>"
+        parts.append(_SECTION_OPEN)
+        parts.append("<h3>基本信息</h3>")
+        parts.append(f"<p>国家: {invoice.country}</p>")
+        parts.append(f"<p>订单编号: {invoice.order_number}</p>")
+        parts.append(f"<p>产品成本: {invoice.product_cost:.2f} RMB ({invoice.product_cost/exchange_rate:.2f} USD)</p>")
+        parts.append(f"<p>运费: {invoice.shipping_cost:.2f} RMB ({invoice.shipping_cost/exchange_rate:.2f} USD)</p>")
+        parts.append(f"<p>IOSS成本: {invoice.ioss_cost:.2f} RMB ({invoice.ioss_cost/exchange_rate:.2f} USD)</p>")
+        parts.append(f"<p>重发成本: {invoice.redelivery_cost:.2f} RMB ({invoice.redelivery_cost/exchange_rate:.2f} USD)</p>")
+        parts.append(f"<p>总费用: {invoice.total_charges:.2f} RMB ({invoice.total_charges/exchange_rate:.2f} USD)</p>")
+        parts.append("</div>")
 
         # 订单项目明细
-        html_result += "<div style='margin-bottom: 20px; padding: 10px; border: 1px solid #ddd; border-radius: 5px;'>"
-        html_result += "<h3>订单项目明细</h3>"
-        html_result += "<table border='1' cellspacing='0' cellpadding='5' style='border-collapse: collapse; width: 100%;'>"
-        html_result += "<tr><th>产品名称</th><th>SKU</th><th>组合SKU</th><th>数量</th><th>统一成本价</th></tr>"
+        parts.append(_INVOICE_ITEMS_SECTION_HEAD)
 
         for order in orders:
-            html_result += f"<tr><td>{order.product_name}</td><td>{order.sku}</td><td>{order.combination_sku}</td><td>{order.quantity}</td><td>{order.uniform_cost_price:.2f}</td></tr>"
+            parts.append(f"<tr><td>{order.product_name}</td><td>{order.sku}</td><td>{order.combination_sku}</td><td>{order.quantity}</td><td>{order.uniform_cost_price:.2f}</td></tr>")
 
-        html_result += "</table>"
-        html_result += "</div>"
-        html_result += "</div>"
-        return html_result
+        parts.append(_TABLE_PAGE_CLOSE)
+        return "".join(parts)
 
     @staticmethod
     def print_no_products_message() -> None:
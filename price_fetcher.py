@@ -1,19 +1,50 @@
 import os
+import time
+import threading
 import pandas as pd
-import gspread
-from google.oauth2.service_account import Credentials
-from models import Product
-from typing import List, Dict, Optional, Any
+from models import Product, ProductRecord
+from typing import List, Dict, Optional, Any, Tuple
 import logging
 from config import AppConfig
+from sheets_client import get_sheets_client
+import disk_cache
+from excel_reader import read_excel
 
 # 配置日志
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 本地缓存的产品数据格式版本(ProductRecord字段变化时需更新)
+_CACHE_FORMAT_VERSION = '2'
+
+def _build_product_data(products: list, fields: pd.DataFrame) -> Dict[str, ProductRecord]:
+    """按列取出产品数据字段后一次遍历组装产品-数据字典(产品名称重复时以最后一行为准)
+
+    fields需包含price、attribute、weight、length、width、height、ioss_price、image_url列
+    """
+    columns = [fields[field].tolist() for field in
+               ('price', 'attribute', 'weight', 'length', 'width', 'height', 'ioss_price', 'image_url')]
+    return dict(zip(products, map(ProductRecord, *columns)))
+
+def _parse_float_column(raw: pd.Series) -> Tuple[pd.Series, Dict[Any, Exception]]:
+    """整列将单元格文本转换为浮点数(空单元格为0)
+
+    pandas无法直接转换的值逐个回退到float()转换，仍然失败的行返回{行索引: 异常}
+    """
+    values = pd.to_numeric(raw, errors='coerce').astype(float)
+    blank = raw.eq('')
+    values[blank] = 0.0
+    errors = {}
+    unparsed = values.isna() & ~blank
+    for idx in unparsed[unparsed].index:
+        try:
+            values[idx] = float(raw[idx])
+        except (ValueError, TypeError) as e:
+            errors[idx] = e
+    return values, errors
+
 class PriceDataSource:
     """价格数据源抽象基类"""
-    def load_product_data(self) -> Dict[str, Dict[str, Any]]:
+    def load_product_data(self) -> Dict[str, ProductRecord]:
         raise NotImplementedError("子类必须实现load_product_data方法")
 
 class ExcelPriceSource(PriceDataSource):
@@ -30,55 +61,84 @@ class ExcelPriceSource(PriceDataSource):
         self.height_column = config.height_column
         self.ioss_price_column = config.ioss_price_column
         self.image_url_column = config.image_url_column
-        self.product_data: Optional[Dict[str, Dict[str, Any]]] = None
-
-    def load_product_data(self) -> Dict[str, Dict[str, Any]]:
-        """加载Excel文件中的产品数据并返回产品-数据字典"""
-        if self.product_data is not None:
-            return self.product_data
-
+        self.cache_dir = config.cache_dir
+        self.product_data: Optional[Dict[str, ProductRecord]] = None
+        # 当前产品数据对应的缓存路径(包含文件修改时间和大小)
+        self._data_key: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def load_product_data(self) -> Dict[str, ProductRecord]:
+        """加载Excel文件中的产品数据并返回产品-数据字典(文件未变化时直接返回已加载的数据)"""
         try:
-            logger.info(f"开始从Excel文件加载产品数据: {self.file_path}")
-            df = pd.read_excel(self.file_path, engine='openpyxl')
-
-            # 验证必要列是否存在
-            if not all(col in df.columns for col in self.required_columns):
-                missing_cols = [col for col in self.required_columns if col not in df.columns]
-                raise ValueError(f"Excel文件缺少必要列: {missing_cols}")
-
-            # 将数值列转换为数字类型，将非数字值转换为NaN
-            numeric_columns = [self.price_column, self.weight_column, self.length_column, self.width_column, self.height_column, self.ioss_price_column]
-            for col in numeric_columns:
-                df[col] = pd.to_numeric(df[col], errors='coerce')
-
-            # 将NaN值填充为0
-            df[numeric_columns] = df[numeric_columns].fillna(0)
-
-            # 转换为产品-数据字典并缓存
-            self.product_data = {}
-            for _, row in df.iterrows():
-                product_name = row[self.product_column]
-                self.product_data[product_name] = {
-                    'price': float(row[self.price_column]),
-                    'attribute': row[self.attribute_column],
-                    'weight': float(row[self.weight_column]),
-                    'length': float(row[self.length_column]),
-                    'width': float(row[self.width_column]),
-                    'height': float(row[self.height_column]),
-                    'ioss_price': float(row[self.ioss_price_column]),
-                    'image_url': row[self.image_url_column] if self.image_url_column in row else ''
-                }
-
-            logger.info(f"成功加载{len(self.product_data)}个产品的数据")
-            return self.product_data
+            # 本地缓存按文件路径、修改时间、大小和列名区分，文件更新后自动失效
+            stat = os.stat(self.file_path)
+            cache_path = disk_cache.cache_path(
+                self.cache_dir, 'excel_products', _CACHE_FORMAT_VERSION, os.path.abspath(self.file_path),
+                str(stat.st_mtime_ns), str(stat.st_size), *self.required_columns, self.product_column,
+                self.price_column, self.attribute_column, self.weight_column, self.length_column,
+                self.width_column, self.height_column, self.ioss_price_column, self.image_url_column
+            )
+            if self.product_data is not None and self._data_key == cache_path:
+                return self.product_data
+
+            with self._lock:
+                # 获取锁后再次检查，避免多个请求同时重复解析Excel文件
+                if self.product_data is not None and self._data_key == cache_path:
+                    return self.product_data
+                return self._load_from_file(cache_path)
 
         except FileNotFoundError:
-            logger.error(f"Excel文件未找到: {self.file_path}")
+            logger.error("Excel文件未找到: %s", self.file_path)
             raise
         except Exception as e:
-            logger.error(f"加载Excel产品数据失败: {str(e)}", exc_info=True)
+            logger.error("加载Excel产品数据失败: %s", e, exc_info=True)
             raise
 
+    def _load_from_file(self, cache_path: str) -> Dict[str, ProductRecord]:
+        """从本地缓存或Excel文件读取产品数据并转换为产品-数据字典"""
+        cached_data = disk_cache.load(cache_path, None)
+        if cached_data is not None:
+            logger.info("从本地缓存加载%s个产品的数据: %s", len(cached_data), cache_path)
+            self.product_data, self._data_key = cached_data, cache_path
+            return cached_data
+
+        logger.info("开始从Excel文件加载产品数据: %s", self.file_path)
+        # 只读取用到的列(必要列和产品数据字段，图片地址列可选)
+        wanted = {*self.required_columns, self.product_column, self.price_column, self.attribute_column,
+                  self.weight_column, self.length_column, self.width_column, self.height_column,
+                  self.ioss_price_column, self.image_url_column}
+        df = read_excel(self.file_path, usecols=lambda col: col in wanted)
+
+        # 验证必要列是否存在
+        missing_cols = [col for col in self.required_columns if col not in df.columns]
+        if missing_cols:
+            raise ValueError(f"Excel文件缺少必要列: {missing_cols}")
+
+        # 数值列整列转换为浮点数(非数字值转换为NaN后填充为0)
+        numeric_fields = {
+            self.price_column: 'price',
+            self.weight_column: 'weight',
+            self.length_column: 'length',
+            self.width_column: 'width',
+            self.height_column: 'height',
+            self.ioss_price_column: 'ioss_price',
+        }
+        fields = pd.DataFrame({
+            field: pd.to_numeric(df[col], errors='coerce').fillna(0).astype(float)
+            for col, field in numeric_fields.items()
+        })
+        fields.insert(1, 'attribute', df[self.attribute_column])
+        fields['image_url'] = df[self.image_url_column] if self.image_url_column in df.columns else ''
+
+        # 按列转换为产品-数据字典
+        product_data = _build_product_data(df[self.product_column].tolist(), fields)
+
+        logger.info("成功加载%s个产品的数据", len(product_data))
+        disk_cache.save(cache_path, product_data)
+        # 数据全部转换完成后再写入缓存，避免并发请求读到未加载完整的数据
+        self.product_data, self._data_key = product_data, cache_path
+        return product_data
+
 class GoogleSheetsPriceSource(PriceDataSource):
     """Google Sheets价格数据源"""
     def __init__(self, config: AppConfig):
@@ -94,117 +154,123 @@ class GoogleSheetsPriceSource(PriceDataSource):
         self.height_column = config.height_column
         self.ioss_price_column = config.ioss_price_column
         self.image_url_column = config.image_url_column
-        self.product_data: Optional[Dict[str, Dict[str, Any]]] = None
-
-    def get_credentials(self):
-        """获取Google认证凭证
-        优先从环境变量GOOGLE_APPLICATION_CREDENTIALS获取路径，
-        如果不存在则使用配置中的路径
-        """
-        # 检查是否有GOOGLE_APPLICATION_CREDENTIALS环境变量
-        env_credentials_path = os.getenv('GOOGLE_APPLICATION_CREDENTIALS')
-        if env_credentials_path:
-            logger.info(f"使用环境变量GOOGLE_APPLICATION_CREDENTIALS指定的凭证路径: {env_credentials_path}")
-            return Credentials.from_service_account_file(
-                env_credentials_path,
-                scopes=['https://www.googleapis.com/auth/spreadsheets.readonly']
-            )
-        else:
-            logger.info(f"使用配置中的凭证路径: {self.credentials_path}")
-            return Credentials.from_service_account_file(
-                self.credentials_path,
-                scopes=['https://www.googleapis.com/auth/spreadsheets.readonly']
-            )
-
-    def load_product_data(self) -> Dict[str, Dict[str, Any]]:
-        """加载Google Sheets中的产品数据并返回产品-数据字典"""
-        if self.product_data is not None:
-            return self.product_data
-
+        self.sheets_client = get_sheets_client(config)
+        self.required_columns = config.required_columns
+        # 进程内缓存和本地缓存的有效期(秒)，过期后重新读取，以便表格更新能够生效
+        self.cache_ttl_seconds = config.sheets_cache_ttl_seconds
+        # 本地缓存文件按格式版本、文档、工作表和列名区分，进程重启后在有效期内无需再次请求Google Sheets
+        self.cache_path = disk_cache.cache_path(config.cache_dir, 'sheets_products', _CACHE_FORMAT_VERSION,
+                                                self.document_id, self.sheet_name, *self.required_columns)
+        self.product_data: Optional[Dict[str, ProductRecord]] = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def load_product_data(self) -> Dict[str, ProductRecord]:
+        """返回Google Sheets中的产品数据(进程内缓存，按有效期刷新，线程安全)"""
+        product_data = self.product_data
+        if product_data is not None and time.monotonic() - self._loaded_at < self.cache_ttl_seconds:
+            return product_data
+
+        with self._lock:
+            # 获取锁后再次检查，避免多个请求同时重复读取Google Sheets
+            product_data = self.product_data
+            if product_data is not None and time.monotonic() - self._loaded_at < self.cache_ttl_seconds:
+                return product_data
+            try:
+                return self._load_from_sheets()
+            except Exception:
+                if product_data is None:
+                    raise
+                # 刷新失败时继续使用旧数据，待下一个有效期后再重试
+                logger.warning("刷新产品数据失败，继续使用已缓存的产品数据", exc_info=True)
+                self._loaded_at = time.monotonic()
+                return product_data
+
+    def _load_from_sheets(self) -> Dict[str, ProductRecord]:
+        """从Google Sheets读取产品数据并转换为产品-数据字典"""
+        # 优先使用未过期的本地缓存
+        cached_data = disk_cache.load(self.cache_path, self.cache_ttl_seconds)
+        if cached_data:
+            logger.info("从本地缓存加载%s个产品的数据: %s", len(cached_data), self.cache_path)
+            self.product_data = cached_data
+            self._loaded_at = time.monotonic()
+            return cached_data
+
+        # 只在使用Google Sheets数据源时才导入gspread
+        import gspread
         try:
-            logger.info(f"开始从Google Sheets加载产品数据: {self.document_id} - {self.sheet_name}")
+            logger.info("开始从Google Sheets加载产品数据: %s - %s", self.document_id, self.sheet_name)
 
-            # 加载凭证并授权
-            credentials = self.get_credentials()
-            client = gspread.authorize(credentials)
+            # 获取工作表数据(与同一文档的其他工作表批量读取，取回二维数组，避免逐行构建字典)
+            rows = self.sheets_client.get_values(self.sheet_name)
 
-            # 打开表格并获取数据
-            sheet = client.open_by_key(self.document_id).worksheet(self.sheet_name)
-            data = sheet.get_all_records()
-
-            if not data:
+            if len(rows) < 2:
                 raise ValueError("Google Sheets中没有找到数据")
 
-            # 验证必要列是否存在
-            required_columns = [self.product_column, self.price_column, self.attribute_column, self.weight_column, self.length_column, self.width_column, self.height_column, self.ioss_price_column, self.image_url_column]
-            if not all(col in data[0] for col in required_columns):
-                missing_cols = [col for col in required_columns if col not in data[0]]
+            # 验证必要列是否存在(列名重复时以最后一列为准)
+            col_idx = {col: i for i, col in enumerate(rows[0])}
+            missing_cols = [col for col in self.required_columns if col not in col_idx]
+            if missing_cols:
                 raise ValueError(f"Google Sheets缺少必要列: {missing_cols}")
 
-            # 转换为产品-数据字典并缓存
-            self.product_data = {}
-            for row in data:
-                product = row[self.product_column]
-                try:
-                    # 处理价格字段
-                    price_str = row[self.price_column]
-                    price = float(price_str) if price_str else 0.0
-
-                    attribute = row[self.attribute_column]
-
-                    # 处理重量字段
-                    weight_str = row[self.weight_column]
-                    weight = float(weight_str) if weight_str else 0.0
-
-                    # 处理长度字段
-                    length_str = row[self.length_column]
-                    length = float(length_str) if length_str else 0.0
-
-                    # 处理宽度字段
-                    width_str = row[self.width_column]
-                    width = float(width_str) if width_str else 0.0
-
-                    # 处理高度字段
-                    height_str = row[self.height_column]
-                    height = float(height_str) if height_str else 0.0
-
-                    # 处理IOSS价格字段
-                    ioss_price_str = row[self.ioss_price_column]
-                    ioss_price = float(ioss_price_str) if ioss_price_str else 0.0
-
-                    # 处理产品图片地址字段
-                    image_url = row.get(self.image_url_column, '')
-
-                    self.product_data[product] = {
-                        'price': price,
-                        'attribute': attribute,
-                        'weight': weight,
-                        'length': length,
-                        'width': width,
-                        'height': height,
-                        'ioss_price': ioss_price,
-                        'image_url': image_url
-                    }
-                except (ValueError, TypeError) as e:
-                    logger.warning(f"产品'{product}'的数据无效: {str(e)}，已跳过")
-
-            if not self.product_data:
+            # 只取需要的列(按列位置)，行尾缺失的单元格补为空字符串
+            columns = [col for col in dict.fromkeys((self.product_column, self.price_column, self.attribute_column,
+                                                     self.weight_column, self.length_column, self.width_column,
+                                                     self.height_column, self.ioss_price_column, self.image_url_column))
+                       if col in col_idx]
+            df = pd.DataFrame(rows[1:]).reindex(columns=[col_idx[col] for col in columns]).fillna('')
+            df.columns = columns
+
+            # 数值列整列转换(空单元格为0)，只有无法转换的单元格才逐个处理
+            numeric_fields = {
+                self.price_column: 'price',
+                self.weight_column: 'weight',
+                self.length_column: 'length',
+                self.width_column: 'width',
+                self.height_column: 'height',
+                self.ioss_price_column: 'ioss_price',
+            }
+            fields = {}
+            invalid_rows = {}
+            for col, field in numeric_fields.items():
+                fields[field], errors = _parse_float_column(df[col])
+                for idx, e in errors.items():
+                    # 每行只记录第一个无效字段的错误
+                    invalid_rows.setdefault(idx, e)
+            fields = pd.DataFrame(fields)
+            fields.insert(1, 'attribute', df[self.attribute_column])
+            fields['image_url'] = df[self.image_url_column] if self.image_url_column in df.columns else ''
+
+            products = df[self.product_column]
+            for idx in sorted(invalid_rows):
+                logger.warning("产品'%s'的数据无效: %s，已跳过", products[idx], invalid_rows[idx])
+
+            # 跳过无效行后按列转换为产品-数据字典
+            valid = ~df.index.isin(list(invalid_rows))
+            product_data = _build_product_data(products[valid].tolist(), fields[valid])
+
+            if not product_data:
                 raise ValueError("没有从Google Sheets中加载到有效的产品数据")
 
-            logger.info(f"成功加载{len(self.product_data)}个产品的数据")
-            return self.product_data
+            logger.info("成功加载%s个产品的数据", len(product_data))
+            # 数据全部转换完成后再写入缓存，避免并发请求读到未加载完整的数据
+            self.product_data = product_data
+            self._loaded_at = time.monotonic()
+            if self.cache_ttl_seconds > 0:
+                disk_cache.save(self.cache_path, product_data)
+            return product_data
 
         except FileNotFoundError:
-            logger.error(f"凭证文件未找到: {self.credentials_path}")
+            logger.error("凭证文件未找到: %s", self.credentials_path)
             raise
         except gspread.exceptions.SpreadsheetNotFound:
-            logger.error(f"找不到指定的Google Sheets文档: {self.document_id}")
+            logger.error("找不到指定的Google Sheets文档: %s", self.document_id)
             raise
         except gspread.exceptions.WorksheetNotFound:
-            logger.error(f"在文档中找不到指定的工作表: {self.sheet_name}")
+            logger.error("在文档中找不到指定的工作表: %s", self.sheet_name)
             raise
         except Exception as e:
-            logger.error(f"加载Google Sheets产品数据失败: {str(e)}", exc_info=True)
+            logger.error("加载Google Sheets产品数据失败: %s", e, exc_info=True)
             raise
 
 class PriceFetcher:
@@ -224,7 +290,7 @@ class PriceFetcher:
                 self.data_source = ExcelPriceSource(self.config)
                 logger.info("已初始化Excel产品数据源")
         except Exception as e:
-            logger.error(f"初始化产品数据源失败: {str(e)}")
+            logger.error("初始化产品数据源失败: %s", e)
             raise
 
     def fetch_product_data(self, products: List[Product]) -> List[Product]:
@@ -235,24 +301,56 @@ class PriceFetcher:
         try:
             product_data = self.data_source.load_product_data()
 
+            # 相同SKU只查找一次(单次dict.get)，结果再分发给所有同名产品
+            get_data = product_data.get
+            resolved = {sku: get_data(sku) for sku in dict.fromkeys(product.sku for product in products)}
+            # 只记录一条汇总日志，未找到的产品最多列出前10个
+            missing = [sku for sku, data in resolved.items() if data is None]
+            logger.info("匹配产品数据: %s/%s", len(resolved) - len(missing), len(resolved))
+            if missing:
+                logger.warning("未找到%s个产品的产品数据: %s%s", len(missing), ', '.join(missing[:10]),
+                               '…' if len(missing) > 10 else '')
+
             for product in products:
-                if product.sku in product_data:
-                    data = product_data[product.sku]
-                    product.price = data['price']
-                    product.attribute = data['attribute']
-                    product.weight = data['weight']
-                    product.length = data['length']
-                    product.width = data['width']
-                    product.height = data['height']
-                    product.ioss_price = data['ioss_price']
-                    if 'image_url' in data:
-                        product.image_url = data['image_url']
-                    logger.info(f"已找到产品'{product.sku}'的完整数据")
-                else:
-                    logger.warning(f"未找到产品'{product.sku}'的产品数据")
+                data = resolved[product.sku]
+                if data is None:
+                    continue
+                product.price = data.price
+                product.attribute = data.attribute
+                product.weight = data.weight
+                product.length = data.length
+                product.width = data.width
+                product.height = data.height
+                product.ioss_price = data.ioss_price
+                product.image_url = data.image_url
 
             return products
 
         except Exception as e:
-            logger.error(f"获取产品数据失败: {str(e)}")
+            logger.error("获取产品数据失败: %s", e)
             raise
+
+_price_fetcher_cache: Dict[tuple, PriceFetcher] = {}
+_price_fetcher_lock = threading.Lock()
+
+def get_price_fetcher(config: AppConfig) -> PriceFetcher:
+    """获取与配置对应的PriceFetcher实例(同一配置复用同一实例，产品数据只加载一次)"""
+    # AppConfig不可哈希，按数据源相关字段生成缓存键
+    google_sheets = config.google_sheets
+    key = (
+        config.data_source,
+        config.excel_path,
+        google_sheets.get('document_id'),
+        google_sheets.get('sheet_name'),
+        google_sheets.get('credentials_path'),
+        config.required_columns,
+        config.image_url_column,
+    )
+    price_fetcher = _price_fetcher_cache.get(key)
+    if price_fetcher is None:
+        with _price_fetcher_lock:
+            # 获取锁后再次检查，避免并发的首次请求各自创建实例
+            price_fetcher = _price_fetcher_cache.get(key)
+            if price_fetcher is None:
+                price_fetcher = _price_fetcher_cache[key] = PriceFetcher(config)
+    return price_fetcher
@@ -0,0 +1,145 @@
+import os
+import time
+import functools
+import threading
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import Dict, List, Optional, Tuple, TYPE_CHECKING
+import logging
+from config import AppConfig
+
+# gspread和google认证库导入较慢，只在实际访问Google Sheets时才导入(只使用Excel数据源时无需加载)
+if TYPE_CHECKING:
+    from google.auth.transport.requests import AuthorizedSession
+    from google.oauth2.service_account import Credentials
+
+logger = logging.getLogger(__name__)
+
+SCOPES = ['https://www.googleapis.com/auth/spreadsheets.readonly']
+
+# 批量预取的工作表数据在此时间(秒)内未被使用则视为过期，重新获取
+_PREFETCH_MAX_AGE_SECONDS = 300
+
+# 连接池大小与失败重试策略(限流和服务端错误时按指数退避重试)
+_POOL_SIZE = 4
+_RETRY = Retry(total=3, backoff_factor=0.3, status_forcelist=(429, 500, 502, 503, 504), raise_on_status=False)
+
+@functools.lru_cache(maxsize=2)
+def _load_credentials(credentials_path: str) -> 'Credentials':
+    """读取并解析服务账号凭证文件(同一路径只解析一次，凭证对象可在多个客户端间共享)"""
+    from google.oauth2.service_account import Credentials
+    return Credentials.from_service_account_file(credentials_path, scopes=SCOPES)
+
+def get_credentials(credentials_path: str) -> 'Credentials':
+    """获取Google认证凭证
+    优先从环境变量GOOGLE_APPLICATION_CREDENTIALS获取路径，
+    如果不存在则使用配置中的路径
+    """
+    env_credentials_path = os.getenv('GOOGLE_APPLICATION_CREDENTIALS')
+    if env_credentials_path:
+        logger.info("使用环境变量GOOGLE_APPLICATION_CREDENTIALS指定的凭证路径: %s", env_credentials_path)
+        return _load_credentials(env_credentials_path)
+    logger.info("使用配置中的凭证路径: %s", credentials_path)
+    return _load_credentials(credentials_path)
+
+def create_session(credentials: 'Credentials') -> 'AuthorizedSession':
+    """创建带连接池和自动重试的授权会话，复用TCP/TLS连接"""
+    from google.auth.transport.requests import AuthorizedSession
+    session = AuthorizedSession(credentials)
+    adapter = HTTPAdapter(pool_connections=_POOL_SIZE, pool_maxsize=_POOL_SIZE, max_retries=_RETRY)
+    session.mount('https://', adapter)
+    return session
+
+class SheetsBatchClient:
+    """同一Google Sheets文档的批量读取客户端
+
+    首次读取任一工作表时，通过一次values.batchGet请求同时取回所有已登记工作表的数据，
+    其余工作表的数据暂存起来供随后的读取直接使用(每份预取数据只使用一次，之后再读取会重新获取)。
+    """
+    def __init__(self, document_id: str, credentials_path: str, sheet_names: Tuple[str, ...]):
+        self.document_id = document_id
+        self.credentials_path = credentials_path
+        self.sheet_names = sheet_names
+        self._spreadsheet = None
+        self._open_lock = threading.Lock()
+        # 只保护预取数据和进行中标记，网络请求在锁外执行，不同工作表的读取不会互相阻塞
+        self._lock = threading.Lock()
+        # {工作表名: (获取时间, 二维数据)}
+        self._prefetched: Dict[str, Tuple[float, List[List[str]]]] = {}
+        # 正在进行的批量请求(完成时set)，同一时间只发出一个批量请求
+        self._in_flight: Optional[threading.Event] = None
+
+    def _open_spreadsheet(self):
+        """打开表格文档(授权和文档元数据请求只执行一次)"""
+        if self._spreadsheet is None:
+            with self._open_lock:
+                if self._spreadsheet is None:
+                    import gspread
+                    session = create_session(get_credentials(self.credentials_path))
+                    client = gspread.authorize(None, session=session)
+                    self._spreadsheet = client.open_by_key(self.document_id)
+        return self._spreadsheet
+
+    def _batch_get(self, spreadsheet) -> Dict[str, List[List[str]]]:
+        """一次请求取回所有已登记工作表的数据"""
+        from gspread.utils import absolute_range_name
+        # 工作表名按A1表示法加引号并转义单引号(如Tom's -> 'Tom''s')
+        ranges = [absolute_range_name(name) for name in self.sheet_names]
+        response = spreadsheet.values_batch_get(ranges)
+        value_ranges = response.get('valueRanges', [])
+        return {name: value_range.get('values', []) for name, value_range in zip(self.sheet_names, value_ranges)}
+
+    def get_values(self, sheet_name: str) -> List[List[str]]:
+        """获取工作表的全部单元格值(二维列表，首行为表头)"""
+        if sheet_name not in self.sheet_names:
+            return self._open_spreadsheet().worksheet(sheet_name).get_all_values()
+
+        while True:
+            with self._lock:
+                prefetched = self._prefetched.pop(sheet_name, None)
+                if prefetched is not None and time.monotonic() - prefetched[0] < _PREFETCH_MAX_AGE_SECONDS:
+                    return prefetched[1]
+                in_flight = self._in_flight
+                if in_flight is None:
+                    in_flight = self._in_flight = threading.Event()
+                    break
+            # 其他线程的批量请求完成后，再从预取数据中取本工作表的数据
+            in_flight.wait()
+
+        try:
+            return self._fetch(sheet_name)
+        finally:
+            with self._lock:
+                self._in_flight = None
+            in_flight.set()
+
+    def _fetch(self, sheet_name: str) -> List[List[str]]:
+        """批量读取所有已登记的工作表，其余工作表的数据存入预取数据"""
+        import gspread
+        spreadsheet = self._open_spreadsheet()
+        try:
+            values = self._batch_get(spreadsheet)
+        except gspread.exceptions.APIError as e:
+            # 批量请求失败(如某个工作表不存在)时退回到单独读取该工作表：
+            # 请求的工作表本身不存在时由worksheet()抛出WorksheetNotFound，调用方据此记录日志
+            logger.warning("批量读取Google Sheets失败，改为单独读取工作表'%s': %s", sheet_name, e)
+            return spreadsheet.worksheet(sheet_name).get_all_values()
+        fetched_at = time.monotonic()
+        with self._lock:
+            self._prefetched = {name: (fetched_at, rows) for name, rows in values.items() if name != sheet_name}
+        logger.info("已批量读取%s个工作表: %s", len(values), ', '.join(values))
+        return values.get(sheet_name, [])
+
+@functools.lru_cache(maxsize=8)
+def _get_client(document_id: str, credentials_path: str, sheet_names: Tuple[str, ...]) -> SheetsBatchClient:
+    return SheetsBatchClient(document_id, credentials_path, sheet_names)
+
+def get_sheets_client(config: AppConfig) -> SheetsBatchClient:
+    """获取配置对应文档的共享批量读取客户端(价格、运费、IOSS工作表一起读取)"""
+    google_sheets = config.google_sheets
+    sheet_names = (
+        google_sheets['sheet_name'],
+        config.google_sheets_shipping_sheet_name,
+        config.google_sheets_ioss_sheet_name,
+    )
+    return _get_client(google_sheets['document_id'], google_sheets['credentials_path'], sheet_names)
@@ -1,15 +1,41 @@
-import os
-import gspread
-from google.oauth2.service_account import Credentials
+import math
+import pandas as pd
 from models import Product, ShippingRule
 from typing import List, Optional
 import logging
 from config import AppConfig
+from sheets_client import get_sheets_client
+import disk_cache
 
 # 配置日志
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 本地缓存的运费规则格式版本(ShippingRule字段变化时需更新)
+_CACHE_FORMAT_VERSION = '1'
+# 视为空值的单元格内容
+_EMPTY = frozenset(('', '-', None))
+
+def _safe_float(value) -> float:
+    """单元格值转换为浮点数，空值或无法转换时为0"""
+    if value in _EMPTY:
+        return 0.0
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return 0.0
+
+def _parse_float_column(raw: pd.Series) -> List[float]:
+    """整列将单元格文本转换为浮点数，pandas无法直接转换的值(含空值)逐个回退到_safe_float"""
+    values = pd.to_numeric(raw, errors='coerce').astype(float)
+    unparsed = values.isna()
+    if unparsed.any():
+        values[unparsed] = raw[unparsed].map(_safe_float)
+    return values.tolist()
+
+def _parse_int_column(raw: pd.Series) -> List[int]:
+    """整列将单元格文本转换为整数(先转为浮点数再向零取整)，空值或无法转换时为0"""
+    return [int(value) if math.isfinite(value) else 0 for value in _parse_float_column(raw)]
+
 class ShippingDataSource:
     """运费数据源抽象基类"""
     def load_rules(self) -> List[ShippingRule]:
@@ -34,42 +60,33 @@ class GoogleSheetsShippingSource(ShippingDataSource):
         self.min_delivery_days_column = '时效最早天数'
         self.max_delivery_days_column = '时效最晚天数'
         self.registration_fee_column = '挂号费(RMB/票)'
+        self.sheets_client = get_sheets_client(config)
+        # 本地缓存文件按格式版本、文档和工作表区分，进程重启后在有效期内无需再次请求Google Sheets
+        self.cache_ttl_seconds = config.sheets_cache_ttl_seconds
+        self.cache_path = disk_cache.cache_path(config.cache_dir, 'shipping_rules', _CACHE_FORMAT_VERSION, self.document_id, self.sheet_name)
         self.shipping_rules: Optional[List[ShippingRule]] = None
 
-    def get_credentials(self):
-        """获取Google认证凭证"""
-        # 检查是否有GOOGLE_APPLICATION_CREDENTIALS环境变量
-        env_credentials_path = os.getenv('GOOGLE_APPLICATION_CREDENTIALS')
-        if env_credentials_path:
-            logger.info(f"使用环境变量GOOGLE_APPLICATION_CREDENTIALS指定的凭证路径: {env_credentials_path}")
-            return Credentials.from_service_account_file(
-                env_credentials_path,
-                scopes=['https://www.googleapis.com/auth/spreadsheets.readonly']
-            )
-        else:
-            logger.info(f"使用配置中的凭证路径: {self.credentials_path}")
-            return Credentials.from_service_account_file(
-                self.credentials_path,
-                scopes=['https://www.googleapis.com/auth/spreadsheets.readonly']
-            )
-
     def load_rules(self) -> List[ShippingRule]:
         """加载Google Sheets中的运费规则"""
         if self.shipping_rules is not None:
             return self.shipping_rules
 
-        try:
-            logger.info(f"开始从Google Sheets加载运费规则: {self.document_id} - {self.sheet_name}")
+        # 优先使用未过期的本地缓存
+        cached_rules = disk_cache.load(self.cache_path, self.cache_ttl_seconds)
+        if cached_rules:
+            logger.info("从本地缓存加载%s条运费规则: %s", len(cached_rules), self.cache_path)
+            self.shipping_rules = cached_rules
+            return self.shipping_rules
 
-            # 加载凭证并授权
-            credentials = self.get_credentials()
-            client = gspread.authorize(credentials)
+        # gspread导入较慢，只在需要请求Google Sheets时才导入(本地缓存命中时无需加载)
+        import gspread
+        try:
+            logger.info("开始从Google Sheets加载运费规则: %s - %s", self.document_id, self.sheet_name)
 
-            # 打开表格并获取数据
-            sheet = client.open_by_key(self.document_id).worksheet(self.sheet_name)
-            data = sheet.get_all_records()
+            # 获取工作表数据(与同一文档的其他工作表批量读取，取回二维数组，避免逐行构建字典)
+            rows = self.sheets_client.get_values(self.sheet_name)
 
-            if not data:
+            if len(rows) < 2:
                 raise ValueError("Google Sheets中没有找到运费规则数据")
 
             # 验证必要列是否存在
@@ -88,65 +105,43 @@ class GoogleSheetsShippingSource(ShippingDataSource):
                 self.max_delivery_days_column,
                 self.registration_fee_column
             ]
-            if not all(col in data[0] for col in required_columns):
-                missing_cols = [col for col in required_columns if col not in data[0]]
+            # 表头只解析一次(列名重复时以最后一列为准)
+            header = rows[0]
+            col_idx = {col: i for i, col in enumerate(header)}
+            missing_cols = [col for col in required_columns if col not in col_idx]
+            if missing_cols:
                 raise ValueError(f"Google Sheets缺少必要列: {missing_cols}")
 
-            # 转换为ShippingRule列表并缓存
-            self.shipping_rules = []
-            for row in data:
-                try:
-                    # 处理可能的空值
-                    def safe_float(value):
-                        if value == '' or value == '-':
-                            return 0.0
-                        try:
-                            return float(value)
-                        except (ValueError, TypeError):
-                            return 0.0
-                            
-                    def safe_int(value):
-                        if value == '' or value == '-':
-                            return 0
-                        try:
-                            return int(float(value))  # 先转为float处理小数，再转为int
-                        except (ValueError, TypeError):
-                            return 0
-                    
-                    rule = ShippingRule(
-                        shipping_company=row[self.shipping_company_column],
-                        attribute=row[self.attribute_column],
-                        country=row[self.country_column],
-                        region=row[self.region_column],
-                        weight_min=safe_float(row[self.weight_min_column]),
-                        weight_max=safe_float(row[self.weight_max_column]),
-                        first_weight=safe_float(row[self.first_weight_column]),
-                        first_weight_fee=safe_float(row[self.first_weight_fee_column]),
-                        additional_weight=safe_float(row[self.additional_weight_column]),
-                        additional_weight_price=safe_float(row[self.additional_weight_price_column]),
-                        min_delivery_days=safe_int(row[self.min_delivery_days_column]),
-                        max_delivery_days=safe_int(row[self.max_delivery_days_column]),
-                        registration_fee=safe_float(row[self.registration_fee_column])
-                    )
-                    self.shipping_rules.append(rule)
-                except (ValueError, TypeError) as e:
-                    logger.warning(f"行数据无效，已跳过: {row}. 错误: {str(e)}")
-
-            if not self.shipping_rules:
+            # 只取需要的列(按列位置)，行尾缺失的单元格补为空字符串；数值列整列转换
+            df = pd.DataFrame(rows[1:]).reindex(columns=[col_idx[col] for col in required_columns]).fillna('')
+            raw = [df.iloc[:, k] for k in range(len(required_columns))]
+            columns = ([col.tolist() for col in raw[:4]] +
+                       [_parse_float_column(col) for col in raw[4:10]] +
+                       [_parse_int_column(col) for col in raw[10:12]] +
+                       [_parse_float_column(raw[12])])
+
+            # 转换为ShippingRule列表并缓存(列顺序与ShippingRule字段顺序一致)
+            shipping_rules = [ShippingRule(*values) for values in zip(*columns)]
+
+            if not shipping_rules:
                 raise ValueError("没有从Google Sheets中加载到有效的运费规则数据")
 
-            logger.info(f"成功加载{len(self.shipping_rules)}条运费规则")
+            logger.info("成功加载%s条运费规则", len(shipping_rules))
+            # 数据全部转换完成后再写入缓存，避免并发请求读到未加载完整的数据
+            self.shipping_rules = shipping_rules
+            if self.cache_ttl_seconds > 0:
+                disk_cache.save(self.cache_path, self.shipping_rules)
             return self.shipping_rules
 
         except FileNotFoundError:
-            logger.error(f"凭证文件未找到: {self.credentials_path}")
+            logger.error("凭证文件未找到: %s", self.credentials_path)
             raise
         except gspread.exceptions.SpreadsheetNotFound:
-            logger.error(f"找不到指定的Google Sheets文档: {self.document_id}")
+            logger.error("找不到指定的Google Sheets文档: %s", self.document_id)
             raise
         except gspread.exceptions.WorksheetNotFound:
-            logger.error(f"在文档中找不到指定的工作表: {self.sheet_name}")
+            logger.error("在文档中找不到指定的工作表: %s", self.sheet_name)
             raise
         except Exception as e:
-            logger.error(f"加载Google Sheets运费规则失败: {str(e)}", exc_info=True)
+            logger.error("加载Google Sheets运费规则失败: %s", e, exc_info=True)
             raise
\ No newline at end of file
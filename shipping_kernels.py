@@ -0,0 +1,39 @@
+import math
+from typing import Tuple
+import numpy as np
+
+# 重量换算为整数毫克后再做向上取整除法，避免浮点误差导致在整倍数边界上多算或少算一个续重单位
+_MG_PER_G = 1000
+
+def compute_fee(total_weight: float, first_weight: float, first_weight_fee: float,
+                additional_weight: float, additional_weight_price: float, registration_fee: float) -> float:
+    """按首重/续重规则计算单票运费
+
+    未超过首重时收取首重费用，超过部分按续重单位向上取整计费，另加挂号费。
+    超过首重时续重单位必须大于0，否则抛出ValueError。
+    """
+    if total_weight <= first_weight:
+        return first_weight_fee + registration_fee
+    if additional_weight <= 0:
+        raise ValueError(f"续重单位必须大于0才能计算超过首重部分的运费: {additional_weight}")
+    remaining_weight = total_weight - first_weight
+    additional_mg = round(additional_weight * _MG_PER_G)
+    if additional_mg <= 0:
+        # 续重单位不足1毫克时无法按整数毫克计算，按浮点数向上取整
+        additional_units = math.ceil(remaining_weight / additional_weight)
+    else:
+        # 续重单位向上取整(整数毫克运算)；已超过首重时至少计1个续重单位(超出不足0.5毫克时也计费)
+        remaining_mg = max(round(remaining_weight * _MG_PER_G), 1)
+        additional_units = -(-remaining_mg // additional_mg)
+    return first_weight_fee + additional_units * additional_weight_price + registration_fee
+
+def compute_weights(quantities: np.ndarray, weights: np.ndarray, lengths: np.ndarray, widths: np.ndarray,
+                    heights: np.ndarray, volume_weight_ratio: float) -> Tuple[np.ndarray, np.ndarray]:
+    """批量计算每个产品的实际重量和体积重量(均已乘以数量)
+
+    只有长、宽、高都有值时才计算体积重量，否则体积重量为0。
+    """
+    actual_weights = quantities * weights
+    has_dimensions = (lengths != 0) & (widths != 0) & (heights != 0)
+    volume_weights = np.where(has_dimensions, lengths * widths * heights / volume_weight_ratio * quantities, 0.0)
+    return actual_weights, volume_weights
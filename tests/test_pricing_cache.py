@@ -0,0 +1,54 @@
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import main
+from ioss_fetcher import IossFetcher
+from models import IossRule, Product
+
+class PricingCacheTest(unittest.TestCase):
+    def setUp(self):
+        main._pricing_cache.clear()
+        self.ioss_rules = [IossRule('Germany', 0.19, 0.02)]
+        data_source = mock.Mock()
+        data_source.load_rules.side_effect = lambda: list(self.ioss_rules)
+        with mock.patch('ioss_fetcher.GoogleSheetsIossSource', return_value=data_source):
+            # 有效期为0：每次查询都重新加载规则
+            self.ioss_fetcher = IossFetcher(SimpleNamespace(ioss_cache_ttl_seconds=0))
+        self.calculator = SimpleNamespace(
+            ioss_fetcher=self.ioss_fetcher,
+            calculate_totals=mock.Mock(return_value=(None, {}, {})),
+        )
+        patches = [
+            mock.patch.object(main, 'load_config'),
+            mock.patch.object(main, 'get_calculator', return_value=self.calculator),
+            mock.patch.object(main.OutputFormatter, 'format_results_as_html', return_value='<div></div>'),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def _check_pricing(self):
+        products = [Product('SKU1', 1, 100.0, '普货', ioss_price=10.0)]
+        return main.check_pricing('Germany', 7.0, {'company': 'A'}, products)
+
+    def test_unchanged_inputs_hit_cache(self):
+        self._check_pricing()
+        self._check_pricing()
+        self.assertEqual(self.calculator.calculate_totals.call_count, 1)
+
+    def test_refreshed_ioss_rule_misses_cache(self):
+        self._check_pricing()
+        self.ioss_rules = [IossRule('Germany', 0.2, 0.02)]
+        self._check_pricing()
+        self.assertEqual(self.calculator.calculate_totals.call_count, 2)
+
+    def test_added_ioss_rule_misses_cache(self):
+        self.ioss_rules = []
+        self._check_pricing()
+        self.ioss_rules = [IossRule('Germany', 0.19, 0.02)]
+        self._check_pricing()
+        self.assertEqual(self.calculator.calculate_totals.call_count, 2)
+
+if __name__ == '__main__':
+    unittest.main()
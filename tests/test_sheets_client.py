@@ -0,0 +1,58 @@
+import unittest
+from unittest import mock
+
+import gspread
+
+from sheets_client import SheetsBatchClient
+
+def _api_error(message):
+    response = mock.Mock()
+    response.json.return_value = {'error': {'code': 400, 'message': message, 'status': 'INVALID_ARGUMENT'}}
+    return gspread.exceptions.APIError(response)
+
+class FakeSpreadsheet:
+    """按工作表名返回数据的表格文档，范围必须是A1表示法中带引号的工作表名"""
+    def __init__(self, sheets):
+        self.sheets = sheets
+        self.requested_ranges = []
+
+    def values_batch_get(self, ranges):
+        self.requested_ranges.extend(ranges)
+        names = []
+        for quoted in ranges:
+            name = quoted[1:-1].replace("''", "'")
+            if name not in self.sheets:
+                raise _api_error(f"Unable to parse range: {quoted}")
+            names.append(name)
+        return {'valueRanges': [{'values': self.sheets[name]} for name in names]}
+
+    def worksheet(self, name):
+        if name not in self.sheets:
+            raise gspread.exceptions.WorksheetNotFound(name)
+        return mock.Mock(get_all_values=mock.Mock(return_value=self.sheets[name]))
+
+class SheetsBatchClientTest(unittest.TestCase):
+    def _client(self, sheet_names, sheets):
+        client = SheetsBatchClient('doc', 'credentials.json', sheet_names)
+        client._spreadsheet = FakeSpreadsheet(sheets)
+        return client
+
+    def test_sheet_name_with_apostrophe(self):
+        client = self._client(("Tom's", 'IOSS'), {"Tom's": [['a']], 'IOSS': [['b']]})
+        self.assertEqual(client.get_values("Tom's"), [['a']])
+        self.assertEqual(client._spreadsheet.requested_ranges, ["'Tom''s'", "'IOSS'"])
+        # 其余工作表使用预取数据
+        self.assertEqual(client.get_values('IOSS'), [['b']])
+        self.assertEqual(len(client._spreadsheet.requested_ranges), 2)
+
+    def test_missing_sheet_raises_worksheet_not_found(self):
+        client = self._client(('Rules', 'IOSS'), {'IOSS': [['b']]})
+        with self.assertRaises(gspread.exceptions.WorksheetNotFound):
+            client.get_values('Rules')
+
+    def test_other_missing_sheet_falls_back_to_single_read(self):
+        client = self._client(('Rules', 'IOSS'), {'IOSS': [['b']]})
+        self.assertEqual(client.get_values('IOSS'), [['b']])
+
+if __name__ == '__main__':
+    unittest.main()
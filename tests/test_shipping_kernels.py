@@ -0,0 +1,40 @@
+import unittest
+
+from shipping_kernels import compute_fee
+
+# 首重500g/20元，续重100g/5元，挂号费8元
+RULE = (500.0, 20.0, 100.0, 5.0, 8.0)
+
+class ComputeFeeTest(unittest.TestCase):
+    def test_within_first_weight(self):
+        self.assertEqual(compute_fee(500.0, *RULE), 28.0)
+
+    def test_exact_multiple_of_additional_weight(self):
+        # 超出部分正好是续重单位的整数倍时不多计一个单位
+        self.assertEqual(compute_fee(800.0, *RULE), 20.0 + 3 * 5.0 + 8.0)
+
+    def test_float_drift_on_boundary(self):
+        # 多个产品重量累加产生的浮点误差不会多计一个续重单位(首重为0时超出部分即总重量)
+        total_weight = 85.4 * 3 + 43.8
+        self.assertGreater(total_weight, 300.0)
+        self.assertEqual(compute_fee(total_weight, 0.0, 20.0, 100.0, 5.0, 8.0), 20.0 + 3 * 5.0 + 8.0)
+
+    def test_partial_unit_rounds_up(self):
+        self.assertEqual(compute_fee(801.0, *RULE), 20.0 + 4 * 5.0 + 8.0)
+
+    def test_tiny_overage_bills_one_unit(self):
+        # 超出首重不足0.5毫克时仍计1个续重单位
+        self.assertEqual(compute_fee(500.0001, *RULE), 20.0 + 5.0 + 8.0)
+
+    def test_sub_milligram_additional_weight(self):
+        # 续重单位不足1毫克时按浮点数向上取整
+        self.assertEqual(compute_fee(500.001, 500.0, 20.0, 0.0004, 1.0, 0.0), 20.0 + 3)
+
+    def test_zero_additional_weight_raises(self):
+        with self.assertRaises(ValueError):
+            compute_fee(600.0, 500.0, 20.0, 0.0, 5.0, 8.0)
+        # 未超过首重时不需要续重单位
+        self.assertEqual(compute_fee(400.0, 500.0, 20.0, 0.0, 5.0, 8.0), 28.0)
+
+if __name__ == '__main__':
+    unittest.main()
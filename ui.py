@@ -1,5 +1,13 @@
+import functools
 import gradio as gr
 
+# 每个事件允许同时处理的请求数(默认为1，多个用户会排队等待Google Sheets等阻塞I/O)
+_CONCURRENCY_LIMIT = 8
+# 排队请求上限，超出时直接提示繁忙，避免请求无限堆积
+_QUEUE_MAX_SIZE = 64
+
+# 界面只构建一次，重复调用时返回同一Blocks实例(需要重新绑定回调时调用create_interface.cache_clear())
+@functools.lru_cache(maxsize=1)
 def create_interface():
     # 函数内导入以避免循环依赖
     from main import process_excel, load_shipping_rules, show_selection, load_products, check_pricing
@@ -51,12 +59,14 @@ def create_interface():
                 shipping_rules_btn.click(
                     fn=load_shipping_rules,
                     inputs=[destination, volume_weight_ratio, products_state],
-                    outputs=[checkbox, id_map_state]
+                    outputs=[checkbox, id_map_state],
+                    concurrency_limit=_CONCURRENCY_LIMIT
                 )
                 checkbox.change(
                     fn=show_selection,
                     inputs=[checkbox, id_map_state],
-                    outputs=[selection_output, selection_text_state]
+                    outputs=[selection_output, selection_text_state],
+                    concurrency_limit=_CONCURRENCY_LIMIT
                 )
 
                 # 提交按钮
@@ -64,11 +74,13 @@ def create_interface():
                 result_output = gr.HTML(label="报价查询结果")
 
                 # 按钮事件
-                load_btn.click(fn=load_products, inputs=[input_text, products_state], outputs=[product_images, products_state])
+                load_btn.click(fn=load_products, inputs=[input_text, products_state], outputs=[product_images, products_state],
+                               concurrency_limit=_CONCURRENCY_LIMIT)
                 submit_btn.click(
                     fn=check_pricing,
                     inputs=[destination, exchange_rate, selection_text_state, products_state],
-                    outputs=[result_output]
+                    outputs=[result_output],
+                    concurrency_limit=_CONCURRENCY_LIMIT
                 )
 
             # 第二个Tab: Invoice 助理
@@ -91,6 +103,8 @@ def create_interface():
                 # 发票信息展示组件
                 invoice_output = gr.HTML(label="发票信息")
 
-                upload_btn.click(fn=process_excel, inputs=[product_excel, shipping_excel, exchange_rate], outputs=[status_message, invoice_output])
+                upload_btn.click(fn=process_excel, inputs=[product_excel, shipping_excel, exchange_rate], outputs=[status_message, invoice_output],
+                                 concurrency_limit=_CONCURRENCY_LIMIT)
 
+    interface.queue(max_size=_QUEUE_MAX_SIZE)
     return interface
\ No newline at end of file